@@ -3,6 +3,11 @@ ASGI config for chat_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with uvicorn so the async chat endpoint (api/chat/async/) can keep
+many LLM calls in flight per process:
+
+    uvicorn chat_backend.asgi:application --host 0.0.0.0 --port 8000
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -1,19 +1,75 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
-from django.db.models import Q, Count, Avg
+from django.db.models import Q, Count, Avg, Exists, OuterRef
 from django.utils import timezone
 from datetime import timedelta
-from .models import Product, InventoryItem, OrderItem, ConversationSession
+from .models import Product, InventoryItem, OrderItem, ConversationSession, Message
+from .search import (
+    FILTER_MODE, FULLTEXT_MODE, SEARCH_MODES, apply_fulltext, fulltext_query,
+    build_product_filters, substring_match, any_substring_match, text_query_match
+)
+from .trending import get_trending_products
+from .caching import cached_search, search_cache_stats
+from .llm import llm_client_stats
+from .llm_breaker import llm_breaker
+from .llm_cache import llm_response_cache
+from .counting import COUNT_MODES, EXACT_COUNT, count_results
+from .history import session_summaries
+from .pagination import (
+    DEFAULT_SORT, MESSAGE_ORDERS, SESSION_ORDERS, SORT_ORDERS, InvalidCursor,
+    clamp_limit, paginate
+)
+from .sampling import sample_products
+from .preferences import compute_profile, get_stored_profile
+from .orders import DEFAULT_HISTORY_LIMIT, get_ecommerce_user_id, get_order_history
 from .serializers import (
     ProductSerializer, ProductSearchResponseSerializer,
-    TrendingProductsSerializer, ConversationSessionSerializer
+    TrendingProductsSerializer, ConversationSessionSerializer,
+    ConversationSummarySerializer, MessageSerializer
 )
 
+def validate_sort(sort, ranked):
+    """400 response for a sort order the search cannot page by, else None"""
+    if sort not in SORT_ORDERS or (sort == 'relevance' and not ranked):
+        allowed = [name for name in SORT_ORDERS if ranked or name != 'relevance']
+        return Response(
+            {'error': f"sort must be one of: {', '.join(allowed)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return None
+
+def validate_count_mode(count_mode):
+    """400 response for an unknown total_count strategy, else None"""
+    if count_mode not in COUNT_MODES:
+        return Response(
+            {'error': f"count must be one of: {', '.join(COUNT_MODES)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return None
+
 class ProductSearchAPIView(APIView):
     """Dedicated product search endpoint with advanced filtering"""
     permission_classes = [permissions.IsAuthenticated]
 
+    def run_search(self, products, sort, limit, cursor, count_mode):
+        """Total count and one keyset page of a product queryset.
+
+        Product rows only; availability is added fresh when serializing, so
+        the result can be cached safely.
+        """
+        total_count, count_is_exact = count_results(products, count_mode)
+        # Keyset page: resumes from the cursor's (sort key, id) so deep
+        # pages cost the same as the first one
+        rows, next_cursor, prev_cursor = paginate(products, sort, limit, cursor)
+        return {
+            'products': rows,
+            'total_count': total_count,
+            'count_is_exact': count_is_exact,
+            'next_cursor': next_cursor,
+            'prev_cursor': prev_cursor,
+        }
+
     def get(self, request):
         """GET method for product search with query parameters"""
         # Extract search parameters
@@ -23,54 +79,84 @@ class ProductSearchAPIView(APIView):
         min_price = request.query_params.get('min_price')
         max_price = request.query_params.get('max_price')
         query = request.query_params.get('q', '')  # General search query
-        limit = int(request.query_params.get('limit', 20))
-        
-        # Build filters
-        filters = Q()
-        
-        if category:
-            filters &= Q(category__icontains=category)
-        if brand and brand.lower() != 'all':
-            filters &= Q(brand__icontains=brand)
-        if department:
-            filters &= Q(department=department)
-        if min_price:
-            filters &= Q(retail_price__gte=float(min_price))
-        if max_price:
-            filters &= Q(retail_price__lte=float(max_price))
-        if query:
-            filters &= (
-                Q(name__icontains=query) | 
-                Q(brand__icontains=query) | 
-                Q(category__icontains=query)
+        limit = clamp_limit(request.query_params.get('limit'), 20)
+        mode = request.query_params.get('mode', FILTER_MODE)
+        if mode not in SEARCH_MODES:
+            return Response(
+                {'error': f"mode must be one of: {', '.join(SEARCH_MODES)}"},
+                status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Build filters (substring filters use the trigram indexes). In
+        # fulltext mode q is matched against the ranked search vector
+        # instead, while the other constraints still apply.
+        filters = build_product_filters(
+            category=category,
+            brand=brand,
+            department=department,
+            min_price=min_price,
+            max_price=max_price,
+            query=query if mode == FILTER_MODE else None,
+        )
+        
         # Execute search
-        products = Product.objects.filter(filters).order_by('retail_price')
-        total_count = products.count()
-        products = products[:limit]
+        products = Product.objects.filter(filters)
+        ranked = mode == FULLTEXT_MODE and fulltext_query(query) is not None
+        if ranked:
+            products = apply_fulltext(products, query)
+        sort = request.query_params.get('sort', 'relevance' if ranked else DEFAULT_SORT)
+        error = validate_sort(sort, ranked)
+        if error:
+            return error
+        count_mode = request.query_params.get('count', EXACT_COUNT)
+        error = validate_count_mode(count_mode)
+        if error:
+            return error
+        
+        def search():
+            page = self.run_search(
+                products, sort, limit, request.query_params.get('cursor'), count_mode
+            )
+            # Generate suggestions if no results
+            page['suggestions'] = []
+            if not page['products'] and not page['prev_cursor']:
+                # Suggest popular categories
+                popular_categories = Product.objects.values('category').annotate(
+                    count=Count('category')
+                ).order_by('-count')[:5]
+                page['suggestions'] = [cat['category'] for cat in popular_categories]
+            return page
         
-        # Generate suggestions if no results
-        suggestions = []
-        if total_count == 0:
-            # Suggest popular categories
-            popular_categories = Product.objects.values('category').annotate(
-                count=Count('category')
-            ).order_by('-count')[:5]
-            suggestions = [cat['category'] for cat in popular_categories]
+        # Identical searches within SEARCH_CACHE_TIMEOUT reuse the page
+        search_params = {
+            'category': category, 'brand': brand, 'department': department,
+            'min_price': min_price, 'max_price': max_price, 'query': query,
+            'mode': mode, 'sort': sort, 'count': count_mode, 'limit': limit,
+            'cursor': request.query_params.get('cursor'),
+        }
+        try:
+            page = cached_search('product-search', search_params, search)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
-            'products': ProductSerializer(products, many=True).data,
-            'total_count': total_count,
+            'products': ProductSerializer(page['products'], many=True).data,
+            'total_count': page['total_count'],
+            'count_is_exact': page['count_is_exact'],
+            'next_cursor': page['next_cursor'],
+            'prev_cursor': page['prev_cursor'],
             'search_params': {
                 'category': category,
                 'brand': brand,
                 'department': department,
                 'min_price': min_price,
                 'max_price': max_price,
-                'query': query
+                'query': query,
+                'mode': mode,
+                'sort': sort,
+                'count': count_mode
             },
-            'suggestions': suggestions
+            'suggestions': page['suggestions']
         })
 
     def post(self, request):
@@ -81,16 +167,10 @@ class ProductSearchAPIView(APIView):
         
         # Handle complex filters from JSON
         if 'categories' in search_data:
-            category_filter = Q()
-            for cat in search_data['categories']:
-                category_filter |= Q(category__icontains=cat)
-            filters &= category_filter
+            filters &= any_substring_match('category', search_data['categories'])
             
         if 'brands' in search_data:
-            brand_filter = Q()
-            for brand in search_data['brands']:
-                brand_filter |= Q(brand__icontains=brand)
-            filters &= brand_filter
+            filters &= any_substring_match('brand', search_data['brands'])
             
         if 'price_range' in search_data:
             price_range = search_data['price_range']
@@ -101,28 +181,52 @@ class ProductSearchAPIView(APIView):
         
         if 'department' in search_data:
             filters &= Q(department=search_data['department'])
+        
+        mode = search_data.get('mode', FILTER_MODE)
+        if mode not in SEARCH_MODES:
+            return Response(
+                {'error': f"mode must be one of: {', '.join(SEARCH_MODES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        query = search_data.get('query', '')
+        if query and mode == FILTER_MODE:
+            filters &= text_query_match(query)
             
         # Execute search
         products = Product.objects.filter(filters)
+        ranked = mode == FULLTEXT_MODE and fulltext_query(query or '') is not None
+        if ranked:
+            products = apply_fulltext(products, query)
         
-        # Apply sorting
+        # Apply sorting; full-text results stay ranked by relevance unless
+        # an explicit sort_by is given
         sort_by = search_data.get('sort_by', 'price')
-        if sort_by == 'price_asc':
-            products = products.order_by('retail_price')
-        elif sort_by == 'price_desc':
-            products = products.order_by('-retail_price')
-        elif sort_by == 'name':
-            products = products.order_by('name')
-        elif sort_by == 'brand':
-            products = products.order_by('brand')
+        if sort_by == 'price':
+            sort_by = 'relevance' if ranked else DEFAULT_SORT
+        error = validate_sort(sort_by, ranked)
+        if error:
+            return error
         
-        limit = search_data.get('limit', 20)
-        total_count = products.count()
-        products = products[:limit]
+        count_mode = search_data.get('count', EXACT_COUNT)
+        error = validate_count_mode(count_mode)
+        if error:
+            return error
+        
+        limit = clamp_limit(search_data.get('limit'), 20)
+        try:
+            cache_params = {**search_data, 'sort_by': sort_by, 'count': count_mode, 'limit': limit}
+            page = cached_search('product-search-post', cache_params, lambda: self.run_search(
+                products, sort_by, limit, search_data.get('cursor'), count_mode
+            ))
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
-            'products': ProductSerializer(products, many=True).data,
-            'total_count': total_count,
+            'products': ProductSerializer(page['products'], many=True).data,
+            'total_count': page['total_count'],
+            'count_is_exact': page['count_is_exact'],
+            'next_cursor': page['next_cursor'],
+            'prev_cursor': page['prev_cursor'],
             'search_params': search_data,
             'applied_filters': str(filters)
         })
@@ -134,38 +238,12 @@ class TrendingProductsAPIView(APIView):
     def get(self, request):
         category = request.query_params.get('category')
         timeframe = request.query_params.get('timeframe', '30')  # days
-        limit = int(request.query_params.get('limit', 10))
-        
-        # Calculate date range
-        days_ago = timezone.now() - timedelta(days=int(timeframe))
-        
-        # Get trending product IDs
-        trending_query = OrderItem.objects.filter(
-            created_at__gte=days_ago
-        ).values('product_id').annotate(
-            order_count=Count('product_id')
-        ).order_by('-order_count')
-        
-        if category:
-            # Filter by category
-            category_products = Product.objects.filter(
-                category__icontains=category
-            ).values_list('id', flat=True)
-            trending_query = trending_query.filter(product_id__in=category_products)
-        
-        trending_product_ids = [
-            item['product_id'] for item in trending_query[:limit]
-        ]
+        limit = clamp_limit(request.query_params.get('limit'), 10)
         
-        # Get product details
-        products = Product.objects.filter(id__in=trending_product_ids)
-        
-        # Sort by trending order
-        products_dict = {p.id: p for p in products}
-        sorted_products = [
-            products_dict[pid] for pid in trending_product_ids 
-            if pid in products_dict
-        ]
+        # Sum the daily rollup over the requested window
+        sorted_products = get_trending_products(
+            days=int(timeframe), category=category, limit=limit
+        )
         
         return Response({
             'trending_products': ProductSerializer(sorted_products, many=True).data,
@@ -174,81 +252,146 @@ class TrendingProductsAPIView(APIView):
             'total_trending': len(sorted_products)
         })
 
+class OrderHistoryAPIView(APIView):
+    """Paginated order history for the signed-in user"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        limit = clamp_limit(request.query_params.get('limit'), DEFAULT_HISTORY_LIMIT)
+        try:
+            offset = max(0, int(request.query_params.get('offset', 0)))
+        except ValueError:
+            return Response(
+                {'error': 'offset must be a non-negative integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        user_id = get_ecommerce_user_id(request.user)
+        if user_id is None:
+            return Response({
+                'orders': [], 'limit': limit, 'offset': offset,
+                'has_more': False, 'next_offset': None
+            })
+        
+        # Items, products and orders are joined in a single query per page
+        rows, has_more = get_order_history(user_id, limit=limit, offset=offset)
+        orders = [
+            {
+                'id': row['id'],
+                'order_id': row['order_id'],
+                'status': row['status'],
+                'order_status': row['order_status'],
+                'num_of_item': row['num_of_item'],
+                'created_at': row['created_at'],
+                'shipped_at': row['shipped_at'],
+                'delivered_at': row['delivered_at'],
+                'returned_at': row['returned_at'],
+                'product_details': {
+                    'id': row['product_id'],
+                    'name': row['name'],
+                    'brand': row['brand'],
+                    'category': row['category'],
+                    'price': row['retail_price']
+                }
+            }
+            for row in rows
+        ]
+        
+        return Response({
+            'orders': orders,
+            'limit': limit,
+            'offset': offset,
+            'has_more': has_more,
+            'next_offset': offset + limit if has_more else None
+        })
+
+PROFILE_SOURCES = ('live', 'precomputed')
+
 class UserPreferencesAPIView(APIView):
     """Manage user preferences and get personalized recommendations"""
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         """Get user's shopping patterns and preferences"""
-        user = request.user
+        source = request.query_params.get('profile', 'live')
+        if source not in PROFILE_SOURCES:
+            return Response(
+                {'error': f"profile must be one of: {', '.join(PROFILE_SOURCES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Get user's order history to infer preferences
-        user_orders = OrderItem.objects.filter(
-            user_id=user.id
-        ).select_related()[:50]  # Recent 50 orders
+        # Profiles are keyed by the e-commerce user id, not the Django one.
+        # Category/brand counts and price stats over the recent window come
+        # from one aggregate query, or from the table maintained by
+        # refresh_preference_profiles when a precomputed profile is requested
+        user_id = get_ecommerce_user_id(request.user)
+        preferences = None
+        if user_id is not None and source == 'precomputed':
+            preferences = get_stored_profile(user_id)
+        if user_id is not None and preferences is None:
+            preferences = compute_profile(user_id)
         
-        if not user_orders:
+        if not preferences:
             return Response({
                 'message': 'No order history found',
                 'preferences': {},
                 'recommendations': []
             })
         
-        # Analyze preferences
-        categories = {}
-        brands = {}
-        price_range = {'min': float('inf'), 'max': 0, 'avg': 0}
-        
-        total_spent = 0
-        for order in user_orders:
-            try:
-                product = Product.objects.get(id=order.product_id)
-                
-                # Count categories
-                categories[product.category] = categories.get(product.category, 0) + 1
-                
-                # Count brands
-                brands[product.brand] = brands.get(product.brand, 0) + 1
-                
-                # Track price range
-                price = float(product.retail_price)
-                price_range['min'] = min(price_range['min'], price)
-                price_range['max'] = max(price_range['max'], price)
-                total_spent += price
-                
-            except Product.DoesNotExist:
-                continue
-        
-        if user_orders:
-            price_range['avg'] = total_spent / len(user_orders)
-            if price_range['min'] == float('inf'):
-                price_range['min'] = 0
-        
-        # Get top preferences
-        top_categories = sorted(categories.items(), key=lambda x: x[1], reverse=True)[:5]
-        top_brands = sorted(brands.items(), key=lambda x: x[1], reverse=True)[:5]
-        
         # Generate recommendations based on preferences
+        top_categories = preferences['favorite_categories']
         if top_categories:
-            recommended_products = Product.objects.filter(
-                category=top_categories[0][0]
-            ).exclude(
-                id__in=[order.product_id for order in user_orders]
-            ).order_by('?')[:6]  # Random selection excluding already bought
+            already_bought = OrderItem.objects.filter(
+                user_id=user_id, product_id=OuterRef('pk')
+            )
+            recommended_products = sample_products(
+                Product.objects.filter(
+                    category=top_categories[0]['name']
+                ).exclude(Exists(already_bought)),
+                6
+            )  # Random selection excluding already bought
         else:
             recommended_products = []
         
         return Response({
-            'preferences': {
-                'favorite_categories': [{'name': cat, 'count': count} for cat, count in top_categories],
-                'favorite_brands': [{'name': brand, 'count': count} for brand, count in top_brands],
-                'price_range': price_range,
-                'total_orders': len(user_orders),
-                'total_spent': total_spent
-            },
+            'preferences': preferences,
             'recommendations': ProductSerializer(recommended_products, many=True).data
         })
 
+class ConversationMessagesAPIView(APIView):
+    """Cursor-paginated messages of one conversation"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, conversation_id):
+        order = request.query_params.get('order', 'newest')
+        if order not in MESSAGE_ORDERS:
+            return Response(
+                {'error': f"order must be one of: {', '.join(MESSAGE_ORDERS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not ConversationSession.objects.filter(id=conversation_id, user=request.user).exists():
+            return Response(
+                {'error': 'Conversation not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        limit = clamp_limit(request.query_params.get('limit'), 50)
+        try:
+            messages, next_cursor, prev_cursor = paginate(
+                Message.objects.filter(session_id=conversation_id), order, limit,
+                request.query_params.get('cursor'), orders=MESSAGE_ORDERS
+            )
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'conversation_id': conversation_id,
+            'messages': MessageSerializer(messages, many=True).data,
+            'order': order,
+            'next_cursor': next_cursor,
+            'prev_cursor': prev_cursor
+        })
+
 class ConversationHistoryAPIView(APIView):
     """Manage conversation history"""
     permission_classes = [permissions.IsAuthenticated]
@@ -273,14 +416,22 @@ class ConversationHistoryAPIView(APIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
         else:
-            # Get all user conversations
-            conversations = ConversationSession.objects.filter(
-                user=user
-            ).order_by('-started_at')[:10]  # Latest 10 conversations
+            # Lightweight session list: counts and previews come from
+            # subqueries, messages are paged via conversations/<id>/messages/
+            limit = clamp_limit(request.query_params.get('limit'), 10)
+            try:
+                conversations, next_cursor, prev_cursor = paginate(
+                    session_summaries(user), 'recent', limit,
+                    request.query_params.get('cursor'), orders=SESSION_ORDERS
+                )
+            except InvalidCursor as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
             
             return Response({
-                'conversations': ConversationSessionSerializer(conversations, many=True).data,
-                'total_count': ConversationSession.objects.filter(user=user).count()
+                'conversations': ConversationSummarySerializer(conversations, many=True).data,
+                'total_count': ConversationSession.objects.filter(user=user).count(),
+                'next_cursor': next_cursor,
+                'prev_cursor': prev_cursor
             })
 
     def delete(self, request, conversation_id):
@@ -298,4 +449,26 @@ class ConversationHistoryAPIView(APIView):
             return Response(
                 {'error': 'Conversation not found'}, 
                 status=status.HTTP_404_NOT_FOUND
-            )
\ No newline at end of file
+            )
+
+
+class LLMStatusAPIView(APIView):
+    """Health of the upstream LLM client: connection pool and reuse counters,
+    circuit breaker state, and the LLM response cache"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response({
+            'client': llm_client_stats(),
+            'breaker': llm_breaker.stats(),
+            'response_cache': llm_response_cache.stats()
+        })
+
+
+class SearchCacheStatusAPIView(APIView):
+    """Product search cache counters of the process serving this request,
+    and the generation shared by every process"""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response(search_cache_stats())
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class ConversationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'conversations'
+
+    def ready(self):
+        from .caching import invalidate_on_product_change
+        from .models import Product
+
+        # Cached searches hold product rows; drop them when products change
+        for signal in (post_save, post_delete):
+            signal.connect(invalidate_on_product_change, sender=Product,
+                           dispatch_uid=f'search-cache-{signal is post_save}')
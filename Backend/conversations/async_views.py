@@ -0,0 +1,61 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .llm import query_llm_async
+from .models import ConversationSession
+from .views import ChatAPIView, wants_llm_cache
+
+
+@sync_to_async
+def authenticate(request):
+    """User for the request's JWT bearer token, or None"""
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+@csrf_exempt
+async def async_chat(request):
+    """Async variant of ChatAPIView.post for ASGI servers.
+
+    The ORM work before and after the LLM call runs through sync_to_async,
+    while the LLM call itself is awaited, so a worker process serves many
+    chats that are waiting on the upstream at once.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    user = await authenticate(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+    text = str(data.get('text', '')).strip()
+    if not text:
+        return JsonResponse({'error': 'No message provided'}, status=400)
+
+    chat = ChatAPIView()
+    try:
+        session, user_context, payload, messages = await sync_to_async(chat.start_turn)(
+            user, text, data.get('conversation_id')
+        )
+    except ConversationSession.DoesNotExist:
+        return JsonResponse({'error': 'Session not found.'}, status=404)
+    if payload:
+        return JsonResponse(payload, status=201)
+
+    ai_response = await query_llm_async(messages, user_context, use_cache=wants_llm_cache(data))
+    print(f"LLM Response: {ai_response}")
+
+    payload = await sync_to_async(chat.complete_turn)(session, text, user_context, ai_response)
+    return JsonResponse(payload, status=201)
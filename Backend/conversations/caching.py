@@ -0,0 +1,124 @@
+import hashlib
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache, caches
+
+# Search results are cached under the current generation. Bumping it
+# invalidates every cached search at once without scanning the cache; stale
+# entries simply age out through their TTL or the backend's MAX_ENTRIES cull.
+# The generation is kept in the shared 'search_meta' cache, so every process
+# sees a bump; entries and hit/miss counters stay in each process's own cache.
+GENERATION_KEY = 'search-cache:generation'
+HITS_KEY = 'search-cache:hits'
+MISSES_KEY = 'search-cache:misses'
+
+
+def search_cache_timeout():
+    return getattr(settings, 'SEARCH_CACHE_TIMEOUT', 120)
+
+
+def normalize_value(value):
+    """Canonical form of a search parameter, so equivalent requests share a key"""
+    if isinstance(value, str):
+        if not value:
+            return None
+        try:
+            # Numeric strings ("50", "50.0") compare equal to numbers
+            return str(Decimal(value).normalize())
+        except InvalidOperation:
+            return value
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float, Decimal)):
+        return str(Decimal(str(value)).normalize())
+    if isinstance(value, (list, tuple)):
+        items = [normalize_value(item) for item in value]
+        return sorted((item for item in items if item not in (None, '')), key=str)
+    if isinstance(value, dict):
+        return normalize_params(value)
+    return str(value)
+
+
+def normalize_params(params):
+    """Drop empty parameters and canonicalize the rest"""
+    normalized = {}
+    for name, value in params.items():
+        value = normalize_value(value)
+        if value not in (None, '', [], {}):
+            normalized[str(name).lower()] = value
+    return normalized
+
+
+def shared_cache():
+    return caches['search_meta']
+
+
+def get_generation():
+    shared = shared_cache()
+    generation = shared.get(GENERATION_KEY)
+    if generation is None:
+        # Seed from the clock so a culled generation key never comes back
+        # as a value that older entries were stored under
+        generation = int(time.time() * 1000)
+        shared.add(GENERATION_KEY, generation, None)
+        generation = shared.get(GENERATION_KEY, generation)
+    return generation
+
+
+def invalidate_search_cache():
+    """Make every cached search result unreachable, in every process"""
+    generation = max(get_generation() + 1, int(time.time() * 1000))
+    shared_cache().set(GENERATION_KEY, generation, None)
+    return generation
+
+
+def search_key(namespace, params):
+    payload = json.dumps(normalize_params(params), sort_keys=True, separators=(',', ':'))
+    digest = hashlib.sha1(payload.encode()).hexdigest()
+    return f'search:{get_generation()}:{namespace}:{digest}'
+
+
+def bump_counter(counter_key):
+    try:
+        cache.incr(counter_key)
+    except ValueError:
+        cache.add(counter_key, 0, None)
+        cache.incr(counter_key)
+
+
+def cached_search(namespace, params, compute):
+    """Result of compute() for these search parameters, from the cache when
+    an equivalent search ran within SEARCH_CACHE_TIMEOUT seconds.
+
+    Only product rows are cached; callers read availability fresh from
+    product_stock, so stock movements never need an invalidation.
+    """
+    key = search_key(namespace, params)
+    result = cache.get(key)
+    if result is not None:
+        bump_counter(HITS_KEY)
+        return result
+    bump_counter(MISSES_KEY)
+    result = compute()
+    cache.set(key, result, search_cache_timeout())
+    return result
+
+
+def search_cache_stats():
+    """This process's hit/miss counters and the shared generation"""
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / lookups if lookups else 0.0,
+        'generation': get_generation(),
+    }
+
+
+def invalidate_on_product_change(sender, **kwargs):
+    invalidate_search_cache()
@@ -0,0 +1,111 @@
+from .models import Message
+
+SYSTEM_PROMPT = "You are STYLISTA, a fashion e-commerce assistant."
+
+# History sent to the LLM each turn: the newest messages that fit the token
+# budget, never more than MAX_CONTEXT_MESSAGES. Older messages are folded
+# into the session's rolling summary, itself kept under SUMMARY_TOKEN_BUDGET.
+CONTEXT_TOKEN_BUDGET = 2000
+MAX_CONTEXT_MESSAGES = 20
+SUMMARY_TOKEN_BUDGET = 300
+SUMMARY_LINE_CHARS = 120
+# Rows fetched per batch when folding a backlog of messages into the summary
+FOLD_BATCH_SIZE = 500
+
+# Rough token estimate (about 4 characters per token for English text, plus
+# per-message overhead), good enough to stay clear of the model limit
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS
+
+
+def summary_line(message):
+    """One compact line per folded message: first line, truncated"""
+    role = 'User' if message.sender == 'user' else 'Assistant'
+    first_line = message.text.strip().split('\n', 1)[0]
+    if len(first_line) > SUMMARY_LINE_CHARS:
+        first_line = first_line[:SUMMARY_LINE_CHARS - 1] + '…'
+    return f'{role}: {first_line}'
+
+
+def fold_into_summary(summary, messages):
+    """Append messages (oldest first) to a summary, dropping its oldest lines
+    once it exceeds SUMMARY_TOKEN_BUDGET
+    """
+    lines = [line for line in summary.split('\n') if line]
+    lines += [summary_line(message) for message in messages]
+    while len(lines) > 1 and estimate_tokens('\n'.join(lines)) > SUMMARY_TOKEN_BUDGET:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+
+def fold_evicted(session, kept):
+    """Fold every message older than the kept history and newer than the
+    summary watermark into the session's summary.
+
+    However many messages slid out since the last turn (long replies,
+    direct-search turns that skip the LLM, bulk inserts), each is folded
+    once, in batches of FOLD_BATCH_SIZE.
+    """
+    summarized_through = session.summarized_through_id or 0
+    evicted = (
+        Message.objects.filter(session=session, id__gt=summarized_through)
+        .exclude(id__in=[message.id for message in kept])
+        .only('id', 'sender', 'text')
+        .order_by('timestamp', 'id')
+    )
+    batch = []
+    for message in evicted.iterator(chunk_size=FOLD_BATCH_SIZE):
+        batch.append(message)
+        if len(batch) == FOLD_BATCH_SIZE:
+            session.summary = fold_into_summary(session.summary, batch)
+            session.summarized_through_id = batch[-1].id
+            batch = []
+    if batch:
+        session.summary = fold_into_summary(session.summary, batch)
+        session.summarized_through_id = batch[-1].id
+    session.save(update_fields=['summary', 'summarized_through_id'])
+
+
+def build_context(session, text):
+    """LLM messages for a new user turn: system prompt, rolling summary,
+    the recent history that fits the token budget, then the new message.
+
+    The newest MAX_CONTEXT_MESSAGES + 1 rows of the session are read from
+    the (session, timestamp, id) index. The summary is cached on the
+    session; when the newest message outside the history hasn't been
+    summarized yet, everything past the summary watermark is folded in.
+    """
+    newest_first = Message.objects.filter(session=session).order_by('-timestamp', '-id')
+    tail = list(newest_first[:MAX_CONTEXT_MESSAGES + 1])
+
+    kept, used = [], 0
+    for message in tail[:MAX_CONTEXT_MESSAGES]:
+        cost = estimate_tokens(message.text)
+        if used + cost > CONTEXT_TOKEN_BUDGET:
+            break
+        kept.append(message)
+        used += cost
+
+    # Older messages are never newer than the first one left out, so when
+    # that one is summarized there is nothing to fold
+    summarized_through = session.summarized_through_id or 0
+    if len(tail) > len(kept) and tail[len(kept)].id > summarized_through:
+        fold_evicted(session, kept)
+
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    if session.summary:
+        messages.append({
+            "role": "system",
+            "content": f"Summary of the earlier conversation:\n{session.summary}"
+        })
+    for message in reversed(kept):
+        messages.append({
+            "role": "user" if message.sender == "user" else "assistant",
+            "content": message.text
+        })
+    messages.append({"role": "user", "content": text})
+    return messages
@@ -0,0 +1,57 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db import connection
+
+# total_count strategies for search responses, picked per request
+EXACT_COUNT = 'exact'
+ESTIMATE_COUNT = 'estimate'
+CAPPED_COUNT = 'capped'
+CACHED_COUNT = 'cached'
+COUNT_MODES = (EXACT_COUNT, ESTIMATE_COUNT, CAPPED_COUNT, CACHED_COUNT)
+
+COUNT_CAP = 1000
+COUNT_CACHE_TIMEOUT = 300  # seconds
+
+
+def planner_estimate(queryset):
+    """Row estimate from EXPLAIN; the query itself is never executed"""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def count_signature(queryset):
+    """Cache key for a filter set, from the SQL it compiles to"""
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.sha1(f'{sql}|{params!r}'.encode()).hexdigest()
+    return f'search-count:{digest}'
+
+
+def count_results(queryset, mode=EXACT_COUNT, cap=COUNT_CAP):
+    """(total_count, count_is_exact) for a search queryset.
+
+    estimate reads the planner's row estimate, capped stops counting at cap
+    (reporting cap when there are more), and cached reuses an exact count
+    for the same filters for COUNT_CACHE_TIMEOUT seconds.
+    """
+    queryset = queryset.order_by()
+    if mode == ESTIMATE_COUNT and connection.vendor == 'postgresql':
+        return planner_estimate(queryset), False
+    if mode == CAPPED_COUNT:
+        count = queryset[:cap + 1].count()
+        return min(count, cap), count <= cap
+    if mode == CACHED_COUNT:
+        key = count_signature(queryset)
+        count = cache.get(key)
+        if count is not None:
+            return count, False
+        count = queryset.count()
+        cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count, True
+    return queryset.count(), True
@@ -0,0 +1,26 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Left
+
+from .models import ConversationSession, Message
+
+PREVIEW_LENGTH = 100
+
+
+def session_summaries(user):
+    """A user's sessions annotated for the sidebar, without their messages.
+
+    Message count, last message time and a preview of the last message are
+    correlated subqueries on the (session, timestamp, id) index, so they are
+    only evaluated for the sessions on the requested page.
+    """
+    session_messages = Message.objects.filter(session=OuterRef('pk'))
+    latest = session_messages.order_by('-timestamp', '-id')
+    message_count = session_messages.order_by().values('session').annotate(
+        count=Count('id')
+    ).values('count')
+
+    return ConversationSession.objects.filter(user=user).annotate(
+        message_count=Coalesce(Subquery(message_count, output_field=IntegerField()), 0),
+        last_message_at=Subquery(latest.values('timestamp')[:1]),
+        last_message_preview=Left(Subquery(latest.values('text')[:1]), PREVIEW_LENGTH),
+    )
@@ -0,0 +1,60 @@
+from .models import ProductStock, ProductCenterStock
+
+# Above this many unsold units a product is shown as plainly "in stock"
+LOW_STOCK_THRESHOLD = 10
+
+# Recomputes both stock summaries from inventory_items. Used by migration
+# 0006 and the rebuild_product_stock command; run it inside a transaction.
+REBUILD_STOCK_SQL = [
+    # Block inventory writes so no trigger delta lands between the two steps
+    'LOCK TABLE inventory_items IN SHARE MODE',
+    'DELETE FROM product_center_stock',
+    'DELETE FROM product_stock',
+    """
+    INSERT INTO product_stock (product_id, available_count, updated_at)
+    SELECT product_id, COUNT(*), NOW() FROM inventory_items
+    WHERE sold_at IS NULL AND product_id IS NOT NULL
+    GROUP BY product_id
+    """,
+    """
+    INSERT INTO product_center_stock (product_id, distribution_center_id, available_count, updated_at)
+    SELECT product_id, product_distribution_center_id, COUNT(*), NOW() FROM inventory_items
+    WHERE sold_at IS NULL AND product_id IS NOT NULL
+      AND product_distribution_center_id IS NOT NULL
+    GROUP BY product_id, product_distribution_center_id
+    """,
+]
+
+
+def rebuild_stock(cursor):
+    """Recompute product_stock and product_center_stock in bulk"""
+    for statement in REBUILD_STOCK_SQL:
+        cursor.execute(statement)
+
+
+def get_available_counts(product_ids):
+    """Unsold units for many products in one lookup on the product_stock summary.
+
+    Products without a summary row have no unsold inventory and map to 0.
+    """
+    product_ids = list(product_ids)
+    counts = dict.fromkeys(product_ids, 0)
+    if product_ids:
+        counts.update(
+            ProductStock.objects.filter(product_id__in=product_ids)
+            .values_list('product_id', 'available_count')
+        )
+    return counts
+
+
+def get_available_count(product_id):
+    """Unsold units for one product"""
+    return get_available_counts([product_id])[product_id]
+
+
+def get_available_counts_by_center(product_id):
+    """Unsold units of a product per distribution center"""
+    return dict(
+        ProductCenterStock.objects.filter(product_id=product_id, available_count__gt=0)
+        .values_list('distribution_center_id', 'available_count')
+    )
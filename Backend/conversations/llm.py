@@ -1,10 +1,30 @@
+import asyncio
+import httpx
 import requests
 import json
 import os
+import random
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from .llm_breaker import llm_breaker
+from .llm_cache import llm_cache_key, llm_response_cache
 from typing import Dict, List, Any
 import re
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "your-groq-api-key-here")
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+# Connect and read timeouts (seconds) for upstream calls, and the number of
+# keep-alive connections the shared sync client pools per host
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", 30))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", 20))
+# Retries wait a random time of up to LLM_BACKOFF_BASE * 2^(retry - 1)
+# seconds, at most LLM_BACKOFF_CAP
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.5))
+LLM_BACKOFF_CAP = float(os.getenv("LLM_BACKOFF_CAP", 8))
+# Upper bound on concurrent upstream connections from the async client
+LLM_ASYNC_MAX_CONNECTIONS = int(os.getenv("LLM_ASYNC_MAX_CONNECTIONS", 500))
 
 # Fashion categories mapping for better understanding
 FASHION_CATEGORIES = {
@@ -254,9 +274,8 @@ def enhance_messages_with_context(messages: List[Dict], user_context: Dict = Non
     
     return enhanced_messages
 
-def query_llm(messages: List[Dict], user_context: Dict = None, max_retries: int = 2) -> str:
-    """Enhanced LLM query with fashion intelligence and retry logic"""
-    url = "https://api.groq.com/openai/v1/chat/completions"
+def build_llm_request(messages: List[Dict], user_context: Dict = None) -> tuple[Dict, Dict]:
+    """Headers and JSON body for a chat completion, shared by the sync and async clients"""
     headers = {
         "Authorization": f"Bearer {GROQ_API_KEY}",
         "Content-Type": "application/json"
@@ -273,38 +292,291 @@ def query_llm(messages: List[Dict], user_context: Dict = None, max_retries: int
         "top_p": 0.9,
         "frequency_penalty": 0.1
     }
+    return headers, data
+
+def fallback_for(data: Dict) -> str:
+    """Local fallback for a request body whose LLM call failed"""
+    enhanced_messages = data["messages"]
+    return create_fallback_response(enhanced_messages[-1]["content"] if enhanced_messages else "")
+
+# Keep-alive connection pool shared by every chat turn and retry, so they
+# reuse connections instead of paying a TCP + TLS handshake. Sessions (and
+# their cookie jars) aren't guaranteed thread-safe, so each worker thread
+# gets its own Session; they all mount the one HTTPAdapter, whose urllib3
+# pool is thread-safe.
+_adapter = None
+_adapter_lock = threading.Lock()
+_thread_state = threading.local()
+
+def get_llm_adapter() -> HTTPAdapter:
+    global _adapter
+    if _adapter is None:
+        with _adapter_lock:
+            if _adapter is None:
+                _adapter = HTTPAdapter(pool_connections=10, pool_maxsize=LLM_POOL_SIZE)
+    return _adapter
+
+def get_llm_session() -> requests.Session:
+    """This thread's session, sending through the shared connection pool"""
+    session = getattr(_thread_state, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = get_llm_adapter()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _thread_state.session = session
+    return session
+
+def llm_client_stats() -> Dict[str, Any]:
+    """Request and connection counts of the shared sync connection pool.
+
+    reused_requests counts requests that were sent on an already open
+    connection, i.e. without a new handshake.
+    """
+    stats = {"requests": 0, "connections_opened": 0, "pool_size": LLM_POOL_SIZE,
+             "connect_timeout": LLM_CONNECT_TIMEOUT, "read_timeout": LLM_READ_TIMEOUT}
+    if _adapter is not None:
+        pools = _adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            stats["requests"] += pool.num_requests
+            stats["connections_opened"] += pool.num_connections
+    stats["reused_requests"] = max(stats["requests"] - stats["connections_opened"], 0)
+    return stats
+
+def backoff_delay(attempt: int, retry_after: float = None) -> float:
+    """Seconds to wait before retry number attempt (1-based).
+
+    Full jitter over a window that doubles with every retry, so clients that
+    failed together don't retry together; never shorter than the upstream's
+    Retry-After, never longer than LLM_BACKOFF_CAP.
+    """
+    delay = random.uniform(0, LLM_BACKOFF_BASE * 2 ** (attempt - 1))
+    if retry_after:
+        delay = max(delay, retry_after)
+    return min(delay, LLM_BACKOFF_CAP)
+
+def retry_after_seconds(response) -> float:
+    """The Retry-After header of an error response in seconds, if numeric"""
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+def cached_completion(messages: List[Dict], user_context: Dict, use_cache: bool):
+    """(cache key, cached completion) for a request; the key is None when
+    caching is off for it
+    """
+    if not use_cache:
+        return None, None
+    key = llm_cache_key(messages, user_context)
+    if key is None:
+        return None, None
+    return key, llm_response_cache.get(key)
+
+def query_llm(messages: List[Dict], user_context: Dict = None, max_retries: int = 2,
+              use_cache: bool = True) -> str:
+    """Enhanced LLM query with fashion intelligence and retry logic.
+
+    Repeated prompts are answered from the LLM response cache without a
+    network call unless use_cache is False.
+    """
+    cache_key, cached = cached_completion(messages, user_context, use_cache)
+    if cached is not None:
+        print(f"LLM cache hit: {cached[:200]}...")
+        return cached
+    
+    headers, data = build_llm_request(messages, user_context)
+    session = get_llm_session()
+    retry_after = None
     
     for attempt in range(max_retries + 1):
+        # While the breaker is open, skip the upstream (and its timeouts)
+        if not llm_breaker.allow_request():
+            print("LLM circuit breaker open, using fallback response")
+            return fallback_for(data)
+        if attempt:
+            time.sleep(backoff_delay(attempt, retry_after))
+        
+        started = time.monotonic()
         try:
-            response = requests.post(url, headers=headers, json=data, timeout=30)
+            response = session.post(
+                GROQ_API_URL, headers=headers, json=data,
+                timeout=(LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT)
+            )
             response.raise_for_status()
             
             result = response.json()["choices"][0]["message"]["content"]
+            llm_breaker.record_success(time.monotonic() - started)
             
             # Log successful response for debugging
             print(f"LLM Response (attempt {attempt + 1}): {result[:200]}...")
             
+            # Only real completions are cached, never the local fallback
+            if cache_key:
+                llm_response_cache.set(cache_key, result)
             return result
             
         except requests.exceptions.HTTPError as e:
             print(f"HTTP Error on attempt {attempt + 1}: {e}")
-            if attempt == max_retries:
-                return create_fallback_response(enhanced_messages[-1]["content"] if enhanced_messages else "")
-                
+            retry_after = retry_after_seconds(e.response)
         except requests.exceptions.Timeout:
             print(f"Timeout on attempt {attempt + 1}")
-            if attempt == max_retries:
-                return create_fallback_response(enhanced_messages[-1]["content"] if enhanced_messages else "")
-                
         except requests.exceptions.RequestException as e:
             print(f"Request error on attempt {attempt + 1}: {e}")
-            if attempt == max_retries:
-                return create_fallback_response(enhanced_messages[-1]["content"] if enhanced_messages else "")
-                
         except Exception as e:
             print(f"Unexpected error on attempt {attempt + 1}: {e}")
-            if attempt == max_retries:
-                return create_fallback_response(enhanced_messages[-1]["content"] if enhanced_messages else "")
+        
+        llm_breaker.record_failure(time.monotonic() - started)
+    
+    return fallback_for(data)
+
+def iter_stream_deltas(response: requests.Response):
+    """Content deltas from a streamed (server-sent events) chat completion"""
+    # chunk_size=None yields bytes as they arrive instead of filling a buffer
+    for line in response.iter_lines(chunk_size=None):
+        if not line.startswith(b"data:"):
+            continue
+        payload = line[len(b"data:"):].strip()
+        if payload == b"[DONE]":
+            return
+        delta = json.loads(payload)["choices"][0].get("delta", {}).get("content")
+        if delta:
+            yield delta
+
+def stream_llm(messages: List[Dict], user_context: Dict = None, max_retries: int = 2,
+               use_cache: bool = True):
+    """query_llm in the provider's stream mode: yields the completion in
+    chunks as they are generated.
+
+    Attempts are only retried while nothing has been yielded; a stream that
+    breaks off midway ends early. A cached completion is yielded in one
+    chunk, and only completions that were read to the end are cached.
+    Closing the generator early closes the upstream response.
+    """
+    cache_key, cached = cached_completion(messages, user_context, use_cache)
+    if cached is not None:
+        print(f"LLM cache hit: {cached[:200]}...")
+        yield cached
+        return
+    
+    headers, data = build_llm_request(messages, user_context)
+    data = {**data, "stream": True}
+    session = get_llm_session()
+    retry_after = None
+    
+    for attempt in range(max_retries + 1):
+        if not llm_breaker.allow_request():
+            print("LLM circuit breaker open, using fallback response")
+            yield fallback_for(data)
+            return
+        if attempt:
+            time.sleep(backoff_delay(attempt, retry_after))
+        
+        received = []
+        started = time.monotonic()
+        connected = False
+        try:
+            with session.post(
+                GROQ_API_URL, headers=headers, json=data, stream=True,
+                timeout=(LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT)
+            ) as response:
+                response.raise_for_status()
+                # Upstream health is judged on the time to start streaming,
+                # not on how long the completion takes to generate
+                connected = True
+                llm_breaker.record_success(time.monotonic() - started)
+                for delta in iter_stream_deltas(response):
+                    received.append(delta)
+                    yield delta
+            
+            result = "".join(received)
+            print(f"LLM Response (attempt {attempt + 1}, streamed): {result[:200]}...")
+            if cache_key and result:
+                llm_response_cache.set(cache_key, result)
+            return
+            
+        except requests.exceptions.HTTPError as e:
+            print(f"HTTP Error on attempt {attempt + 1}: {e}")
+            retry_after = retry_after_seconds(e.response)
+        except requests.exceptions.Timeout:
+            print(f"Timeout on attempt {attempt + 1}")
+        except requests.exceptions.RequestException as e:
+            print(f"Request error on attempt {attempt + 1}: {e}")
+        except Exception as e:
+            print(f"Unexpected error on attempt {attempt + 1}: {e}")
+        
+        if not connected:
+            llm_breaker.record_failure(time.monotonic() - started)
+        if received:
+            print("Stream interrupted after partial output")
+            return
+    
+    yield fallback_for(data)
+
+# One AsyncClient per event loop (uvicorn runs a single loop per process), so
+# every in-flight chat request shares its connection pool
+_async_clients = {}
+
+def get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        # Drop clients left behind by loops that have since closed
+        for stale in [other for other in _async_clients if other.is_closed()]:
+            del _async_clients[stale]
+        client = _async_clients[loop] = httpx.AsyncClient(
+            timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=LLM_ASYNC_MAX_CONNECTIONS),
+        )
+    return client
+
+async def query_llm_async(messages: List[Dict], user_context: Dict = None, max_retries: int = 2,
+                          use_cache: bool = True) -> str:
+    """Non-blocking query_llm: awaits the upstream so the event loop can serve
+    other requests meanwhile. Same retries, fallback and cache as query_llm.
+    """
+    cache_key, cached = cached_completion(messages, user_context, use_cache)
+    if cached is not None:
+        print(f"LLM cache hit: {cached[:200]}...")
+        return cached
+    
+    headers, data = build_llm_request(messages, user_context)
+    client = get_async_client()
+    retry_after = None
+    
+    for attempt in range(max_retries + 1):
+        if not llm_breaker.allow_request():
+            print("LLM circuit breaker open, using fallback response")
+            return fallback_for(data)
+        if attempt:
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+        
+        started = time.monotonic()
+        try:
+            response = await client.post(GROQ_API_URL, headers=headers, json=data)
+            response.raise_for_status()
+            
+            result = response.json()["choices"][0]["message"]["content"]
+            llm_breaker.record_success(time.monotonic() - started)
+            print(f"LLM Response (attempt {attempt + 1}): {result[:200]}...")
+            if cache_key:
+                llm_response_cache.set(cache_key, result)
+            return result
+            
+        except httpx.HTTPStatusError as e:
+            print(f"HTTP Error on attempt {attempt + 1}: {e}")
+            retry_after = retry_after_seconds(e.response)
+        except httpx.TimeoutException:
+            print(f"Timeout on attempt {attempt + 1}")
+        except httpx.RequestError as e:
+            print(f"Request error on attempt {attempt + 1}: {e}")
+        except Exception as e:
+            print(f"Unexpected error on attempt {attempt + 1}: {e}")
+        
+        llm_breaker.record_failure(time.monotonic() - started)
+    
+    return fallback_for(data)
 
 def create_fallback_response(user_message: str) -> str:
     """Create a fallback JSON response when LLM fails"""
@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+from collections import deque
+
+# The breaker judges the upstream on its last LLM_BREAKER_WINDOW calls, once
+# at least LLM_BREAKER_MIN_CALLS have been made. It opens when the share of
+# failed calls, or of calls slower than LLM_BREAKER_SLOW_CALL seconds,
+# reaches the matching rate.
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", 20))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", 5))
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", 0.5))
+LLM_BREAKER_SLOW_CALL = float(os.getenv("LLM_BREAKER_SLOW_CALL", 10))
+LLM_BREAKER_SLOW_RATE = float(os.getenv("LLM_BREAKER_SLOW_RATE", 0.8))
+# Seconds an open breaker waits before letting a probe call through
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", 30))
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Stops calling an upstream that keeps failing or stalling.
+
+    closed: calls go through and their outcomes are recorded.
+    open: calls are refused until the cooldown has passed.
+    half_open: one probe call goes through; its success closes the breaker,
+    its failure opens it again for another cooldown.
+    """
+
+    def __init__(self, window=LLM_BREAKER_WINDOW, min_calls=LLM_BREAKER_MIN_CALLS,
+                 failure_rate=LLM_BREAKER_FAILURE_RATE, slow_call=LLM_BREAKER_SLOW_CALL,
+                 slow_rate=LLM_BREAKER_SLOW_RATE, cooldown=LLM_BREAKER_COOLDOWN,
+                 probe_timeout=None, clock=time.monotonic):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.cooldown = cooldown
+        # A probe that never reports back frees its slot after this long
+        self.probe_timeout = probe_timeout if probe_timeout is not None else cooldown
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.calls = deque(maxlen=window)  # (succeeded, slow)
+        self.state = CLOSED
+        self.opened_at = None
+        self.probe_started = None
+        self.trips = 0
+        self.rejected = 0
+
+    def allow_request(self):
+        """Whether a call may go to the upstream now"""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            now = self.clock()
+            if self.state == OPEN and now - self.opened_at < self.cooldown:
+                self.rejected += 1
+                return False
+            if self.state == HALF_OPEN and now - self.probe_started < self.probe_timeout:
+                # A probe is already in flight
+                self.rejected += 1
+                return False
+            if self.state == OPEN:
+                print("LLM circuit breaker half-open: probing upstream")
+            self.state = HALF_OPEN
+            self.probe_started = now
+            return True
+
+    def record_success(self, latency):
+        with self.lock:
+            if self.state == HALF_OPEN:
+                print("LLM circuit breaker closed: upstream recovered")
+                self.state = CLOSED
+                self.calls.clear()
+            elif self.state == CLOSED:
+                self.calls.append((True, latency >= self.slow_call))
+                self.check_rates()
+
+    def record_failure(self, latency):
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.trip('probe failed')
+            elif self.state == CLOSED:
+                self.calls.append((False, latency >= self.slow_call))
+                self.check_rates()
+
+    def rates(self):
+        if not self.calls:
+            return 0.0, 0.0
+        failed = sum(1 for succeeded, _ in self.calls if not succeeded)
+        slow = sum(1 for _, is_slow in self.calls if is_slow)
+        return failed / len(self.calls), slow / len(self.calls)
+
+    def check_rates(self):
+        if len(self.calls) < self.min_calls:
+            return
+        failure_rate, slow_rate = self.rates()
+        if failure_rate >= self.failure_rate:
+            self.trip(f'{failure_rate:.0%} of recent calls failed')
+        elif slow_rate >= self.slow_rate:
+            self.trip(f'{slow_rate:.0%} of recent calls took over {self.slow_call:g}s')
+
+    def trip(self, reason):
+        print(f"LLM circuit breaker open: {reason}")
+        self.state = OPEN
+        self.opened_at = self.clock()
+        self.probe_started = None
+        self.trips += 1
+        self.calls.clear()
+
+    def stats(self):
+        with self.lock:
+            failure_rate, slow_rate = self.rates()
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(self.cooldown - (self.clock() - self.opened_at), 0.0)
+            return {
+                'state': self.state,
+                'trips': self.trips,
+                'rejected': self.rejected,
+                'recent_calls': len(self.calls),
+                'failure_rate': failure_rate,
+                'slow_rate': slow_rate,
+                'retry_in': retry_in,
+            }
+
+
+llm_breaker = CircuitBreaker()
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Completions are cached per process for LLM_CACHE_TTL seconds, keeping at
+# most LLM_CACHE_MAX_ENTRIES (least recently used evicted first)
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 512))
+# History messages before the new one that count towards the key
+LLM_CACHE_HISTORY_MESSAGES = int(os.getenv("LLM_CACHE_HISTORY_MESSAGES", 2))
+
+# user_context fields that reach the prompt (enhance_messages_with_context)
+CONTEXT_FIELDS = ('age', 'gender', 'location')
+
+
+class TTLLRUCache:
+    """Thread-safe LRU mapping whose entries also expire after ttl seconds"""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+llm_response_cache = TTLLRUCache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL)
+
+
+def normalize_text(text):
+    """Case, whitespace and trailing punctuation don't change the answer"""
+    text = re.sub(r'\s+', ' ', str(text).lower()).strip()
+    return text.rstrip('?!. ')
+
+
+def llm_cache_key(messages, user_context=None):
+    """Key for a completion request: the new user message, the few history
+    messages right before it (the running summary and older turns are left
+    out) and the user context fields used in the prompt
+    """
+    conversation = [m for m in messages if m['role'] != 'system']
+    if not conversation:
+        return None
+    recent = conversation[-(LLM_CACHE_HISTORY_MESSAGES + 1):]
+    context = {field: (user_context or {}).get(field) for field in CONTEXT_FIELDS}
+    payload = json.dumps({
+        'messages': [[m['role'], normalize_text(m['content'])] for m in recent],
+        'context': context,
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
@@ -0,0 +1,42 @@
+import json
+
+from django.db import connection, transaction
+
+# Planner settings that stop Postgres from using any index, approximating
+# the query plans from before the index pack was installed.
+WITHOUT_INDEXES = [
+    'SET LOCAL enable_indexscan = off',
+    'SET LOCAL enable_bitmapscan = off',
+    'SET LOCAL enable_indexonlyscan = off',
+]
+
+
+def explain_analyze(sql, params=(), settings=()):
+    """Run EXPLAIN ANALYZE and return (execution time in ms, top plan node)"""
+    with transaction.atomic(), connection.cursor() as cursor:
+        for statement in settings:
+            cursor.execute(statement)
+        cursor.execute(f'EXPLAIN (ANALYZE, FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        # Roll back so settings and any side effects never leak out
+        transaction.set_rollback(True)
+    return plan[0]['Execution Time'], describe_plan(plan[0]['Plan'])
+
+
+def describe_plan(node):
+    """Summarise the scan strategy of a plan, e.g. 'Index Scan on order_items'"""
+    scans = []
+
+    def walk(current):
+        if 'Relation Name' in current:
+            index = f" using {current['Index Name']}" if 'Index Name' in current else ''
+            scans.append(f"{current['Node Type']} on {current['Relation Name']}{index}")
+        elif 'Index Name' in current:
+            scans.append(f"{current['Node Type']} using {current['Index Name']}")
+        for child in current.get('Plans', []):
+            walk(child)
+
+    walk(node)
+    return '; '.join(scans) or node['Node Type']
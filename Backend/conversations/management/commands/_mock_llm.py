@@ -0,0 +1,98 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from conversations import llm
+
+COMPLETION = '{"action": "show_trends", "category": "all"}'
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, latency, completion=COMPLETION, token_delay=0.0, status=200):
+        self.latency = latency
+        self.status = status
+        self.completion = completion
+        self.token_delay = token_delay
+        self.requests_served = 0
+        self.lock = threading.Lock()
+        super().__init__(('127.0.0.1', 0), MockCompletionHandler)
+
+
+def split_tokens(text, size=4):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class MockCompletionHandler(BaseHTTPRequestHandler):
+    """Answers every chat completion after the server's latency. Streamed
+    requests get one event per token, token_delay apart."""
+
+    # Keep-alive, like the real API, so clients can reuse connections
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        time.sleep(self.server.latency)
+        if self.server.status != 200:
+            # A degraded upstream: fail after the latency
+            self.send_json(self.server.status, {'error': {'message': 'Service unavailable'}})
+        elif request.get('stream'):
+            self.stream_completion()
+        else:
+            # A whole completion takes as long to generate as its stream
+            time.sleep(self.server.token_delay * (len(split_tokens(self.server.completion)) - 1))
+            self.send_json(200, {'choices': [{'message': {'content': self.server.completion}}]})
+        with self.server.lock:
+            self.server.requests_served += 1
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def write_chunk(self, data):
+        self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+        self.wfile.flush()
+
+    def stream_completion(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for i, token in enumerate(split_tokens(self.server.completion)):
+                if i:
+                    time.sleep(self.server.token_delay)
+                event = {'choices': [{'delta': {'content': token}}]}
+                self.write_chunk(f'data: {json.dumps(event)}\n\n'.encode())
+            self.write_chunk(b'data: [DONE]\n\n')
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading, e.g. once it had a whole action
+            self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def mock_llm_upstream(latency, completion=COMPLETION, token_delay=0.0, status=200):
+    """Run a local completions endpoint and point llm.GROQ_API_URL at it"""
+    server = MockLLMServer(latency, completion, token_delay, status)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    real_url = llm.GROQ_API_URL
+    llm.GROQ_API_URL = f'http://127.0.0.1:{server.server_port}/openai/v1/chat/completions'
+    try:
+        yield server
+    finally:
+        llm.GROQ_API_URL = real_url
+        server.shutdown()
+        server.server_close()
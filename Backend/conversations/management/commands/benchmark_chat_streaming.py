@@ -0,0 +1,73 @@
+import contextlib
+import io
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from conversations.llm import query_llm, stream_llm
+from conversations.streaming import classify_stream
+
+from ._mock_llm import COMPLETION, mock_llm_upstream
+
+MESSAGES = [
+    {"role": "system", "content": "You are STYLISTA, a fashion e-commerce assistant."},
+    {"role": "user", "content": "Any tips for a first date?"},
+]
+PROSE = (
+    "For a first date, aim for smart casual: dark jeans or chinos, a crisp shirt "
+    "or a fitted knit, and clean leather sneakers or loafers. Add one statement "
+    "piece, like a good watch or a soft overshirt, and make sure everything fits "
+    "well. Comfort matters too, so pick something you can relax in."
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how soon a chat reply starts arriving against a local mock "
+        "upstream: the full completion (query_llm) versus the first streamed "
+        "token (stream_llm), and how soon a streamed JSON action is detected."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--latency', type=float, default=0.3,
+                            help='Seconds before the mock upstream sends its first token')
+        parser.add_argument('--token-delay', type=float, default=0.02,
+                            help='Seconds between streamed tokens')
+
+    def first_output(self, func):
+        """Seconds until func's first chunk and until its last"""
+        started = time.perf_counter()
+        first = None
+        for _ in func():
+            if first is None:
+                first = time.perf_counter() - started
+        return first, time.perf_counter() - started
+
+    def measure(self, func, runs):
+        # The LLM client logs every response; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            timings = [self.first_output(func) for _ in range(runs)]
+        return [statistics.median(column) for column in zip(*timings)]
+
+    def handle(self, *args, **options):
+        runs, latency, token_delay = options['runs'], options['latency'], options['token_delay']
+
+        with mock_llm_upstream(latency, PROSE, token_delay):
+            blocking = self.measure(lambda: [query_llm(MESSAGES, use_cache=False)], runs)
+            streamed = self.measure(lambda: stream_llm(MESSAGES, use_cache=False), runs)
+        with mock_llm_upstream(latency, COMPLETION + '\n' + PROSE, token_delay):
+            action = self.measure(lambda: classify_stream(stream_llm(MESSAGES, use_cache=False)), runs)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"Median of {runs} runs, {latency:.2f}s to first token, "
+            f"{token_delay * 1000:.0f}ms per token"
+        ))
+        self.stdout.write(f"  {'':32} {'first output':>12} {'complete':>10}")
+        for label, (first, total) in (
+            ('prose, full completion', blocking),
+            ('prose, streamed', streamed),
+            ('JSON action, streamed', action),
+        ):
+            self.stdout.write(f'  {label:32} {first * 1000:10.0f}ms {total * 1000:8.0f}ms')
@@ -0,0 +1,68 @@
+import asyncio
+import contextlib
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from conversations.llm import llm_client_stats, query_llm, query_llm_async
+
+from ._mock_llm import mock_llm_upstream
+
+MESSAGES = [
+    {"role": "system", "content": "You are STYLISTA, a fashion e-commerce assistant."},
+    {"role": "user", "content": "What's trending?"},
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare chat LLM throughput against a local mock upstream: blocking "
+        "query_llm on a fixed pool of sync workers versus query_llm_async "
+        "with every call in flight on one event loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--latency', type=float, default=0.5,
+                            help='Seconds the mock upstream takes per completion')
+        parser.add_argument('--sync-workers', type=int, default=4,
+                            help='Worker threads standing in for sync server workers')
+
+    def run_sync(self, count, workers):
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(lambda _: query_llm(MESSAGES, use_cache=False), range(count)))
+
+    async def run_async(self, count):
+        return await asyncio.gather(*(query_llm_async(MESSAGES, use_cache=False) for _ in range(count)))
+
+    def timed(self, func):
+        started = time.perf_counter()
+        # query_llm logs every response; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = func()
+        return time.perf_counter() - started, results
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        with mock_llm_upstream(options['latency']) as upstream:
+            before = llm_client_stats()
+            sync_elapsed, _ = self.timed(lambda: self.run_sync(count, options['sync_workers']))
+            after = llm_client_stats()
+            async_elapsed, _ = self.timed(lambda: asyncio.run(self.run_async(count)))
+            served = upstream.requests_served
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{count} chat completions, {options['latency']:.2f}s upstream latency "
+            f"({served} upstream requests served)"
+        ))
+        for label, elapsed in (
+            (f"sync, {options['sync_workers']} workers", sync_elapsed),
+            ('async, one event loop', async_elapsed),
+        ):
+            self.stdout.write(f'  {label:25} {elapsed:7.2f}s  {count / elapsed:8.1f} req/s')
+        self.stdout.write(
+            f"  sync client opened {after['connections_opened'] - before['connections_opened']} "
+            f"connections for {after['requests'] - before['requests']} requests"
+        )
@@ -0,0 +1,100 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from conversations.models import Product
+from conversations.search import build_product_filters
+
+# Temporary copy of the catalog, scaled up to show how latency grows
+BENCH_TABLE = 'products_search_bench'
+
+TRIGRAM_INDEXES = [
+    f'CREATE INDEX ON {BENCH_TABLE} USING gin (UPPER(name::text) gin_trgm_ops)',
+    f'CREATE INDEX ON {BENCH_TABLE} USING gin (UPPER(brand::text) gin_trgm_ops)',
+    f'CREATE INDEX ON {BENCH_TABLE} USING gin (UPPER(category::text) gin_trgm_ops)',
+]
+
+SEARCHES = [
+    ('category "jean"', {'category': 'jean'}),
+    ('brand "levi"', {'brand': 'levi'}),
+    ('query "shirt" (name | brand | category)', {'query': 'shirt'}),
+    ('category "swim" + department + price', {
+        'category': 'swim', 'department': 'Women', 'max_price': 50,
+    }),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the product substring searches against copies of the "
+        "catalog scaled 1x, 2x, 4x ... with and without trigram indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 4, 8])
+        parser.add_argument('--runs', type=int, default=5,
+                            help='Executions per search; the median is reported')
+
+    def search_sql(self, params):
+        """SQL the views run for these params, pointed at the bench table"""
+        queryset = Product.objects.filter(build_product_filters(**params)).order_by('retail_price')[:20]
+        sql, sql_params = queryset.query.sql_with_params()
+        return sql.replace('"products"', f'"{BENCH_TABLE}"'), sql_params
+
+    def build_table(self, cursor, scale):
+        cursor.execute(f'DROP TABLE IF EXISTS {BENCH_TABLE}')
+        cursor.execute(f"""
+            CREATE TEMP TABLE {BENCH_TABLE} AS
+            SELECT p.id + (copy - 1) * bounds.max_id AS id, p.cost, p.category,
+                   p.name, p.brand, p.retail_price, p.department, p.sku,
+                   p.distribution_center_id
+            FROM products p
+            CROSS JOIN generate_series(1, %s) AS copy
+            CROSS JOIN (SELECT MAX(id) AS max_id FROM products) AS bounds
+        """, [scale])
+        cursor.execute(f'SELECT COUNT(*) FROM {BENCH_TABLE}')
+        return cursor.fetchone()[0]
+
+    def median_ms(self, cursor, sql, params, runs):
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return timings[len(timings) // 2]
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            has_trigram = cursor.fetchone() is not None
+            if not has_trigram:
+                self.stdout.write(self.style.WARNING(
+                    'pg_trgm is not installed; only sequential-scan timings are reported'
+                ))
+
+            searches = [(label, *self.search_sql(params)) for label, params in SEARCHES]
+            for scale in options['scales']:
+                rows = self.build_table(cursor, scale)
+                cursor.execute(f'ANALYZE {BENCH_TABLE}')
+                scan = {label: self.median_ms(cursor, sql, params, options['runs'])
+                        for label, sql, params in searches}
+
+                indexed = {}
+                if has_trigram:
+                    for statement in TRIGRAM_INDEXES:
+                        cursor.execute(statement)
+                    cursor.execute(f'ANALYZE {BENCH_TABLE}')
+                    indexed = {label: self.median_ms(cursor, sql, params, options['runs'])
+                               for label, sql, params in searches}
+
+                self.stdout.write(self.style.MIGRATE_HEADING(f'{scale}x catalog ({rows} products)'))
+                for label, _, _ in searches:
+                    line = f'  {label:45} seq scan {scan[label]:8.2f} ms'
+                    if label in indexed:
+                        line += f'   trigram {indexed[label]:8.2f} ms'
+                    self.stdout.write(line)
+
+            cursor.execute(f'DROP TABLE IF EXISTS {BENCH_TABLE}')
@@ -0,0 +1,90 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from conversations.models import Product
+from conversations.sampling import RANDOM_KEY, window_sizes, windows_query
+
+# Temporary copy of the catalog, scaled up to show how latency grows
+BENCH_TABLE = 'products_sampling_bench'
+
+FILTERS = [
+    ('whole catalog', Q()),
+    ('category "Jeans"', Q(category='Jeans')),
+    ('casual styles, Women', Q(category__in=['Tops & Tees', 'Jeans', 'Shorts'], department='Women')),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark ORDER BY random() against random_key index sampling for "
+        "the recommendation filters, on copies of the catalog scaled 1x, 2x, 4x ..."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 4, 8])
+        parser.add_argument('--runs', type=int, default=5,
+                            help='Executions per query; the median is reported')
+        parser.add_argument('--k', type=int, default=8, help='Products per sample')
+
+    def bench_sql(self, queryset):
+        """SQL for a queryset, pointed at the bench table"""
+        sql, params = queryset.query.sql_with_params()
+        return sql.replace('"products"', f'"{BENCH_TABLE}"'), params
+
+    def build_table(self, cursor, scale):
+        cursor.execute(f'DROP TABLE IF EXISTS {BENCH_TABLE}')
+        cursor.execute(f"""
+            CREATE TEMP TABLE {BENCH_TABLE} AS
+            SELECT p.id + (copy - 1) * bounds.max_id AS id, p.cost, p.category,
+                   p.name, p.brand, p.retail_price, p.department, p.sku,
+                   p.distribution_center_id, random() AS random_key
+            FROM products p
+            CROSS JOIN generate_series(1, %s) AS copy
+            CROSS JOIN (SELECT MAX(id) AS max_id FROM products) AS bounds
+        """, [scale])
+        cursor.execute(f'CREATE INDEX ON {BENCH_TABLE} (random_key)')
+        cursor.execute(f'ANALYZE {BENCH_TABLE}')
+        cursor.execute(f'SELECT COUNT(*) FROM {BENCH_TABLE}')
+        return cursor.fetchone()[0]
+
+    def median_ms(self, cursor, statements, runs):
+        timings = []
+        for run in range(runs):
+            started = time.perf_counter()
+            for sql, params in statements(run):
+                cursor.execute(sql, params)
+                cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return timings[len(timings) // 2]
+
+    def handle(self, *args, **options):
+        k = options['k']
+        runs = options['runs']
+        with connection.cursor() as cursor:
+            for scale in options['scales']:
+                rows = self.build_table(cursor, scale)
+                self.stdout.write(self.style.MIGRATE_HEADING(f'{scale}x catalog ({rows} products)'))
+
+                for label, filters in FILTERS:
+                    products = Product.objects.filter(filters)
+                    random_sort = self.bench_sql(products.order_by('?')[:k])
+
+                    # The single query sample_products issues, with every
+                    # window's wrap-around probe (the worst case)
+                    keyed = products.alias(random_key=RANDOM_KEY).order_by('random_key')
+                    def probes(run):
+                        return [self.bench_sql(windows_query(keyed, window_sizes(k), random.Random(run)))]
+
+                    sort_ms = self.median_ms(cursor, lambda run: [random_sort], runs)
+                    key_ms = self.median_ms(cursor, probes, runs)
+                    self.stdout.write(
+                        f'  {label:25} ORDER BY random() {sort_ms:8.2f} ms'
+                        f'   random_key {key_ms:8.2f} ms'
+                    )
+
+            cursor.execute(f'DROP TABLE IF EXISTS {BENCH_TABLE}')
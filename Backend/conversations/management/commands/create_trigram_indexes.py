@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from conversations.trigram import TrigramUnavailable, create_trigram_indexes
+
+
+class Command(BaseCommand):
+    help = (
+        "Enable pg_trgm and build the trigram indexes behind product "
+        "substring search. Migration 0004 skips them when pg_trgm is missing; "
+        "run this once the extension is installed. Safe to re-run."
+    )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Trigram indexes need PostgreSQL')
+        if 'products' not in connection.introspection.table_names():
+            raise CommandError('Table products does not exist; load the data first')
+        try:
+            create_trigram_indexes(connection)
+        except TrigramUnavailable as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS('Trigram indexes on products are in place'))
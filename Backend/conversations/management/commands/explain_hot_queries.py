@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from ._explain import WITHOUT_INDEXES, explain_analyze
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN ANALYZE the hot e-commerce queries used by the chat and "
+        "product views, with and without the index pack from migration 0003."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs', type=int, default=3,
+            help='Executions per query; the best time is reported',
+        )
+
+    def sample_values(self):
+        """Pick realistic parameters from the loaded dataset"""
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT product_id FROM inventory_items WHERE sold_at IS NULL LIMIT 1')
+            product_id = (cursor.fetchone() or [1])[0]
+            cursor.execute('SELECT user_id FROM order_items LIMIT 1')
+            user_id = (cursor.fetchone() or [1])[0]
+            cursor.execute('SELECT email FROM users LIMIT 1')
+            email = (cursor.fetchone() or [''])[0]
+            cursor.execute('SELECT category, department FROM products LIMIT 1')
+            category, department = cursor.fetchone() or ('Jeans', 'Women')
+            cursor.execute('SELECT MAX(created_at) FROM order_items')
+            latest = cursor.fetchone()[0]
+        since = latest - timedelta(days=30) if latest else None
+        return product_id, user_id, email, category, department, since
+
+    def hot_queries(self):
+        product_id, user_id, email, category, department, since = self.sample_values()
+        return [
+            (
+                'Availability count (InventoryItem product_id, sold_at IS NULL)',
+                'SELECT COUNT(*) FROM inventory_items WHERE product_id = %s AND sold_at IS NULL',
+                [product_id],
+            ),
+            (
+                'Trending group-by (OrderItem created_at >= ...)',
+                'SELECT product_id, COUNT(product_id) AS order_count FROM order_items '
+                'WHERE created_at >= %s GROUP BY product_id ORDER BY order_count DESC LIMIT 10',
+                [since],
+            ),
+            (
+                'Order history (OrderItem user_id)',
+                'SELECT * FROM order_items WHERE user_id = %s ORDER BY created_at DESC LIMIT 5',
+                [user_id],
+            ),
+            (
+                'User context (EcommerceUser email=...)',
+                'SELECT * FROM users WHERE email = %s LIMIT 1',
+                [email],
+            ),
+            (
+                'Category/department listing by price',
+                'SELECT * FROM products WHERE category = %s AND department = %s '
+                'ORDER BY retail_price LIMIT 20',
+                [category, department],
+            ),
+        ]
+
+    def best_of(self, runs, sql, params, settings=()):
+        results = [explain_analyze(sql, params, settings) for _ in range(runs)]
+        return min(results, key=lambda result: result[0])
+
+    def handle(self, *args, **options):
+        runs = max(1, options['runs'])
+        for label, sql, params in self.hot_queries():
+            before_ms, before_plan = self.best_of(runs, sql, params, WITHOUT_INDEXES)
+            after_ms, after_plan = self.best_of(runs, sql, params)
+            speedup = before_ms / after_ms if after_ms else float('inf')
+
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(f'  before: {before_ms:9.3f} ms  {before_plan}')
+            self.stdout.write(f'  after:  {after_ms:9.3f} ms  {after_plan}')
+            self.stdout.write(self.style.SUCCESS(f'  speedup: {speedup:.1f}x'))
@@ -0,0 +1,195 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+# Tables that can be range-partitioned by month on created_at
+PARTITIONED_TABLES = ['order_items', 'inventory_items']
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y%m}'
+
+
+class Command(BaseCommand):
+    help = (
+        "Create and maintain monthly range partitions on created_at for "
+        "order_items and inventory_items. --convert turns the existing tables "
+        "into partitioned tables (once); afterwards run it monthly to create "
+        "upcoming partitions, and use --detach-before to drop old months "
+        "out of the table cheaply."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tables', nargs='+', choices=PARTITIONED_TABLES,
+                            default=PARTITIONED_TABLES)
+        parser.add_argument('--convert', action='store_true',
+                            help='Rebuild the tables as monthly partitioned tables')
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='Months of empty partitions to keep ready (default: 3)')
+        parser.add_argument('--detach-before', metavar='YYYY-MM',
+                            help='Detach partitions for months before this one')
+        parser.add_argument('--drop-detached', action='store_true',
+                            help='Drop partitions after detaching them')
+
+    # --- Introspection ------------------------------------------------------
+
+    def is_partitioned(self, cursor, table):
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table]
+        )
+        row = cursor.fetchone()
+        if row is None:
+            raise CommandError(f'Table {table} does not exist')
+        return row[0] == 'p'
+
+    def partitions(self, cursor, table):
+        cursor.execute("""
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = to_regclass(%s)
+        """, [table])
+        return {row[0] for row in cursor.fetchall()}
+
+    # --- Conversion ---------------------------------------------------------
+
+    def convert(self, cursor, table):
+        """Swap a plain table for a partitioned one, keeping data, indexes and triggers"""
+        legacy = f'{table}_unpartitioned'
+        cursor.execute(f"""
+            SELECT pg_get_indexdef(indexrelid) FROM pg_index
+            WHERE indrelid = '{table}'::regclass AND NOT indisprimary
+        """)
+        index_defs = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"""
+            SELECT pg_get_triggerdef(oid) FROM pg_trigger
+            WHERE tgrelid = '{table}'::regclass AND NOT tgisinternal
+        """)
+        trigger_defs = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"SELECT MIN(created_at), MAX(created_at) FROM {table}")
+        first, last = cursor.fetchone()
+
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {legacy}')
+        cursor.execute(f"""
+            CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS)
+            PARTITION BY RANGE (created_at)
+        """)
+        # Postgres requires the partition key in every unique constraint, so
+        # id stays unique together with created_at (NULLs are allowed and
+        # land in the default partition). That key can't catch a reloaded
+        # row with a NULL created_at, so local_data.py matches staged rows
+        # to existing ones on id.
+        cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_id_created_at_key UNIQUE (id, created_at)')
+        cursor.execute(f'ALTER SEQUENCE IF EXISTS {table}_id_seq OWNED BY {table}.id')
+        cursor.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+        today = month_start(date.today())
+        start = month_start(first) if first else today
+        end = max(month_start(last) if last else today, today)
+        month = start
+        while month <= end:
+            self.create_partition(cursor, table, month)
+            month = add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO {table} SELECT * FROM {legacy}')
+        cursor.execute(f'DROP TABLE {legacy}')
+
+        # Recreate secondary indexes on the parent (they cascade to every
+        # partition) and the stock triggers from the old table.
+        for definition in index_defs:
+            cursor.execute(definition)
+        for definition in trigger_defs:
+            cursor.execute(definition)
+        cursor.execute(f'ANALYZE {table}')
+
+    # --- Maintenance --------------------------------------------------------
+
+    def create_partition(self, cursor, table, month):
+        """Create the partition for one month, moving any of its rows out of the default partition"""
+        name = partition_name(table, month)
+        if name in self.partitions(cursor, table):
+            return False
+        start, end = month, add_months(month, 1)
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {table}_default WHERE created_at >= %s AND created_at < %s)",
+            [start, end],
+        )
+        if cursor.fetchone()[0]:
+            cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {table}_default')
+            cursor.execute(f"""
+                CREATE TABLE {name} PARTITION OF {table}
+                FOR VALUES FROM ('{start}') TO ('{end}')
+            """)
+            cursor.execute(f"""
+                WITH moved AS (
+                    DELETE FROM {table}_default
+                    WHERE created_at >= %s AND created_at < %s RETURNING *
+                )
+                INSERT INTO {table} SELECT * FROM moved
+            """, [start, end])
+            cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {table}_default DEFAULT')
+        else:
+            cursor.execute(f"""
+                CREATE TABLE {name} PARTITION OF {table}
+                FOR VALUES FROM ('{start}') TO ('{end}')
+            """)
+        return True
+
+    def detach_before(self, cursor, table, cutoff, drop):
+        detached = []
+        for name in sorted(self.partitions(cursor, table)):
+            suffix = name[len(table) + 2:]
+            if not name.startswith(f'{table}_p') or not suffix.isdigit():
+                continue
+            if date(int(suffix[:4]), int(suffix[4:]), 1) < cutoff:
+                cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {name}')
+                if drop:
+                    cursor.execute(f'DROP TABLE {name}')
+                detached.append(name)
+        return detached
+
+    def handle(self, *args, **options):
+        cutoff = None
+        if options['detach_before']:
+            try:
+                year, month = options['detach_before'].split('-')
+                cutoff = date(int(year), int(month), 1)
+            except ValueError:
+                raise CommandError('--detach-before must look like YYYY-MM')
+
+        for table in options['tables']:
+            with transaction.atomic(), connection.cursor() as cursor:
+                if not self.is_partitioned(cursor, table):
+                    if not options['convert']:
+                        self.stdout.write(self.style.WARNING(
+                            f'{table} is not partitioned; run with --convert first'
+                        ))
+                        continue
+                    self.stdout.write(f'Converting {table} to monthly partitions...')
+                    self.convert(cursor, table)
+
+                this_month = month_start(date.today())
+                created = [
+                    partition_name(table, add_months(this_month, offset))
+                    for offset in range(options['months_ahead'] + 1)
+                    if self.create_partition(cursor, table, add_months(this_month, offset))
+                ]
+                if created:
+                    self.stdout.write(f"  {table}: created {', '.join(created)}")
+
+                if cutoff:
+                    detached = self.detach_before(cursor, table, cutoff, options['drop_detached'])
+                    action = 'dropped' if options['drop_detached'] else 'detached'
+                    self.stdout.write(f"  {table}: {action} {len(detached)} partitions")
+
+                count = len(self.partitions(cursor, table))
+                self.stdout.write(self.style.SUCCESS(f'{table}: {count} partitions'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from conversations.inventory import rebuild_stock
+from conversations.models import ProductStock, ProductCenterStock
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the product_stock and product_center_stock summaries from "
+        "inventory_items in bulk. Triggers keep them current afterwards."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            rebuild_stock(cursor)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt stock for {ProductStock.objects.count()} products '
+            f'({ProductCenterStock.objects.count()} product/center rows)'
+        ))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from conversations.preferences import PREFERENCE_WINDOW, refresh_profiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the precomputed user_preference_profiles served by "
+        "user/preferences/?profile=precomputed. Users are processed in id "
+        "ranges so each batch is a single aggregate query."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='User ids per aggregate query (default: 5000)')
+        parser.add_argument('--window', type=int, default=PREFERENCE_WINDOW,
+                            help=f'Recent order items per user (default: {PREFERENCE_WINDOW})')
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT MIN(user_id), MAX(user_id) FROM order_items")
+            first_id, last_id = cursor.fetchone()
+        if first_id is None:
+            self.stdout.write("order_items is empty; nothing to build")
+            return
+
+        started = time.perf_counter()
+        written = 0
+        batch_size = options['batch_size']
+        for batch_start in range(first_id, last_id + 1, batch_size):
+            written += refresh_profiles(batch_start, batch_start + batch_size - 1, options['window'])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {written} preference profiles in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from conversations.models import ProductDailySales
+from conversations.trending import refresh_daily_sales
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh the product_daily_sales rollup behind the trending endpoints. "
+        "By default only the newest rolled-up day onward is recomputed; run it "
+        "daily (or more often) from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Rebuild every day from order_items')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        since = refresh_daily_sales(full=options['full'])
+        elapsed = time.perf_counter() - started
+
+        scope = f'days from {since}' if since else 'all days'
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed {scope} in {elapsed:.2f}s '
+            f'({ProductDailySales.objects.count()} product/day rows)'
+        ))
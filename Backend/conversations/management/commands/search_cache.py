@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from conversations.caching import get_generation, invalidate_search_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the product search cache generation, or invalidate every cached "
+        "search in every server process with --invalidate (run after loading "
+        "product data outside Django). Hit/miss counters are kept per server "
+        "process: see GET /api/products/search/cache/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invalidate', action='store_true',
+                            help='Start a new cache generation')
+
+    def handle(self, *args, **options):
+        if options['invalidate']:
+            generation = invalidate_search_cache()
+            self.stdout.write(self.style.SUCCESS(f'Search cache invalidated (generation {generation})'))
+        else:
+            self.stdout.write(f'generation {get_generation()}')
@@ -0,0 +1,21 @@
+def run_if_tables_exist(sql, tables):
+    """RunPython operation executing raw SQL on PostgreSQL once the given
+    tables exist.
+
+    The e-commerce tables are created by schema.sql (their models are
+    managed = False), so migrations touching them are skipped when the tables
+    are missing, e.g. in a fresh test database.
+    """
+    def operation(apps, schema_editor):
+        connection = schema_editor.connection
+        if connection.vendor != 'postgresql':
+            return
+        if not set(tables) <= set(connection.introspection.table_names()):
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(sql)
+    return operation
+
+
+def run_if_products_exist(sql):
+    return run_if_tables_exist(sql, ['products'])
@@ -0,0 +1,48 @@
+from django.db import migrations
+
+from conversations.migration_sql import run_if_tables_exist
+
+# The e-commerce tables are created by schema.sql (their models are
+# managed = False), so the indexes are maintained here as raw SQL. The
+# operations are skipped when the tables don't exist, e.g. in a fresh test
+# database.
+ECOMMERCE_TABLES = ['inventory_items', 'order_items', 'users', 'products']
+
+CREATE_INDEXES = """
+CREATE INDEX IF NOT EXISTS inventory_items_unsold_product_idx
+    ON inventory_items (product_id) WHERE sold_at IS NULL;
+CREATE INDEX IF NOT EXISTS order_items_created_product_idx
+    ON order_items (created_at, product_id);
+CREATE INDEX IF NOT EXISTS order_items_user_created_idx
+    ON order_items (user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS users_email_idx
+    ON users (email);
+CREATE INDEX IF NOT EXISTS products_category_department_price_idx
+    ON products (category, department, retail_price);
+ANALYZE inventory_items;
+ANALYZE order_items;
+ANALYZE users;
+ANALYZE products;
+"""
+
+DROP_INDEXES = """
+DROP INDEX IF EXISTS inventory_items_unsold_product_idx;
+DROP INDEX IF EXISTS order_items_created_product_idx;
+DROP INDEX IF EXISTS order_items_user_created_idx;
+DROP INDEX IF EXISTS users_email_idx;
+DROP INDEX IF EXISTS products_category_department_price_idx;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversations', '0002_distributioncenter_ecommerceuser_inventoryitem_order_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_if_tables_exist(CREATE_INDEXES, ECOMMERCE_TABLES),
+            run_if_tables_exist(DROP_INDEXES, ECOMMERCE_TABLES),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+from conversations.trigram import TrigramUnavailable, create_trigram_indexes, drop_trigram_indexes
+
+
+def create_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    if 'products' not in connection.introspection.table_names():
+        return
+    try:
+        create_trigram_indexes(connection)
+    except TrigramUnavailable as e:
+        # The rest of the app works without these indexes; build them later
+        # with the idempotent command rather than blocking the migration
+        print(f"\n  {e}; skipping trigram indexes."
+              "\n  Run `python manage.py create_trigram_indexes` once pg_trgm is installed.")
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    drop_trigram_indexes(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversations', '0003_ecommerce_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+from conversations.migration_sql import run_if_products_exist
+
+# Stored full-text vector for products: name is weighted above brand, and
+# brand above category. Being a generated column, it stays current for rows
+# written by local_data.py without any application code.
+ADD_SEARCH_VECTOR = """
+ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(brand, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(category, '')), 'C')
+    ) STORED;
+CREATE INDEX IF NOT EXISTS products_search_vector_idx
+    ON products USING gin (search_vector);
+ANALYZE products;
+"""
+
+DROP_SEARCH_VECTOR = """
+DROP INDEX IF EXISTS products_search_vector_idx;
+ALTER TABLE products DROP COLUMN IF EXISTS search_vector;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversations', '0004_product_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_if_products_exist(ADD_SEARCH_VECTOR),
+            run_if_products_exist(DROP_SEARCH_VECTOR),
+        ),
+    ]
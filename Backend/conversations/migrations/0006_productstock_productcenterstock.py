@@ -0,0 +1,121 @@
+from django.db import migrations, models
+
+from conversations.inventory import rebuild_stock
+
+# product_stock / product_center_stock are kept current by statement-level
+# triggers on inventory_items. Transition tables let one bulk INSERT (such
+# as a COPY batch from local_data.py) update the summary with a single
+# grouped upsert instead of one upsert per inventory row.
+APPLY_DELTAS = """
+WITH changes AS (
+    {changes}
+), delta AS (
+    SELECT product_id, center_id, SUM(change) AS change
+    FROM changes
+    WHERE product_id IS NOT NULL
+    GROUP BY product_id, center_id
+    HAVING SUM(change) <> 0
+), per_product AS (
+    INSERT INTO product_stock AS s (product_id, available_count, updated_at)
+    SELECT product_id, SUM(change), NOW() FROM delta
+    GROUP BY product_id HAVING SUM(change) <> 0
+    ON CONFLICT (product_id) DO UPDATE
+    SET available_count = s.available_count + EXCLUDED.available_count,
+        updated_at = EXCLUDED.updated_at
+)
+INSERT INTO product_center_stock AS s (product_id, distribution_center_id, available_count, updated_at)
+SELECT product_id, center_id, change, NOW() FROM delta
+WHERE center_id IS NOT NULL
+ON CONFLICT (product_id, distribution_center_id) DO UPDATE
+SET available_count = s.available_count + EXCLUDED.available_count,
+    updated_at = EXCLUDED.updated_at;
+"""
+
+ADDED_ROWS = """SELECT product_id, product_distribution_center_id AS center_id, 1 AS change
+    FROM new_rows WHERE sold_at IS NULL"""
+REMOVED_ROWS = """SELECT product_id, product_distribution_center_id AS center_id, -1 AS change
+    FROM old_rows WHERE sold_at IS NULL"""
+
+TRIGGERS = {
+    'insert': ('INSERT', 'NEW TABLE AS new_rows', ADDED_ROWS),
+    'update': ('UPDATE', 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+               f'{ADDED_ROWS}\n    UNION ALL\n    {REMOVED_ROWS}'),
+    'delete': ('DELETE', 'OLD TABLE AS old_rows', REMOVED_ROWS),
+}
+
+
+def trigger_sql(name, event, transition, changes):
+    return f"""
+CREATE OR REPLACE FUNCTION inventory_items_stock_{name}() RETURNS trigger AS $$
+BEGIN
+{APPLY_DELTAS.format(changes=changes)}
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS inventory_items_stock_{name} ON inventory_items;
+CREATE TRIGGER inventory_items_stock_{name}
+    AFTER {event} ON inventory_items
+    REFERENCING {transition}
+    FOR EACH STATEMENT EXECUTE FUNCTION inventory_items_stock_{name}();
+"""
+
+
+def install_stock_triggers(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    if 'inventory_items' not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        for name, (event, transition, changes) in TRIGGERS.items():
+            cursor.execute(trigger_sql(name, event, transition, changes))
+        rebuild_stock(cursor)
+
+
+def remove_stock_triggers(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    if 'inventory_items' not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS inventory_items_stock_{name} ON inventory_items')
+            cursor.execute(f'DROP FUNCTION IF EXISTS inventory_items_stock_{name}()')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversations', '0005_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStock',
+            fields=[
+                ('product_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('available_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'product_stock',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductCenterStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.IntegerField()),
+                ('distribution_center_id', models.IntegerField()),
+                ('available_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'product_center_stock',
+                'unique_together': {('product_id', 'distribution_center_id')},
+            },
+        ),
+        migrations.RunPython(install_stock_triggers, remove_stock_triggers),
+    ]
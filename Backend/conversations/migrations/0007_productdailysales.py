@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:48
+
+from django.db import migrations, models
+
+BUILD_ROLLUP = """
+INSERT INTO product_daily_sales (day, product_id, order_count)
+SELECT created_at::date, product_id, COUNT(*)
+FROM order_items
+WHERE created_at IS NOT NULL AND product_id IS NOT NULL
+GROUP BY created_at::date, product_id
+"""
+
+
+def build_rollup(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    if 'order_items' not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(BUILD_ROLLUP)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversations', '0006_productstock_productcenterstock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductDailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('product_id', models.IntegerField()),
+                ('order_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'product_daily_sales',
+                'unique_together': {('day', 'product_id')},
+            },
+        ),
+        migrations.RunPython(build_rollup, migrations.RunPython.noop),
+    ]
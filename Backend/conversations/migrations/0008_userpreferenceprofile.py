@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversations', '0007_productdailysales'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserPreferenceProfile',
+            fields=[
+                ('user_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('favorite_categories', models.JSONField(default=list)),
+                ('favorite_brands', models.JSONField(default=list)),
+                ('min_price', models.FloatField(default=0)),
+                ('max_price', models.FloatField(default=0)),
+                ('avg_price', models.FloatField(default=0)),
+                ('total_orders', models.IntegerField(default=0)),
+                ('total_spent', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'user_preference_profiles',
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+from conversations.migration_sql import run_if_products_exist
+
+# Uniform random key per product so sampling can walk an index instead of
+# sorting the table with ORDER BY random(). New rows get a key from the
+# column default, including rows written by local_data.py.
+ADD_RANDOM_KEY = """
+ALTER TABLE products ADD COLUMN IF NOT EXISTS random_key double precision
+    NOT NULL DEFAULT random();
+CREATE INDEX IF NOT EXISTS products_random_key_idx ON products (random_key);
+ANALYZE products;
+"""
+
+DROP_RANDOM_KEY = """
+DROP INDEX IF EXISTS products_random_key_idx;
+ALTER TABLE products DROP COLUMN IF EXISTS random_key;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversations', '0008_userpreferenceprofile'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_if_products_exist(ADD_RANDOM_KEY),
+            run_if_products_exist(DROP_RANDOM_KEY),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+from conversations.migration_sql import run_if_products_exist
+
+# (sort key, id) indexes for keyset pagination of product searches: a page
+# is an index range scan starting at the cursor, however deep it is.
+ADD_SORT_INDEXES = """
+CREATE INDEX IF NOT EXISTS products_retail_price_id_idx ON products (retail_price, id);
+CREATE INDEX IF NOT EXISTS products_name_id_idx ON products (name, id);
+CREATE INDEX IF NOT EXISTS products_brand_id_idx ON products (brand, id);
+ANALYZE products;
+"""
+
+DROP_SORT_INDEXES = """
+DROP INDEX IF EXISTS products_retail_price_id_idx;
+DROP INDEX IF EXISTS products_name_id_idx;
+DROP INDEX IF EXISTS products_brand_id_idx;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversations', '0009_product_random_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_if_products_exist(ADD_SORT_INDEXES),
+            run_if_products_exist(DROP_SORT_INDEXES),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.core.management import call_command
+from django.db import migrations
+
+TABLE = 'search_cache_meta'
+
+
+def create_cache_table(apps, schema_editor):
+    # The shared 'search_meta' cache (see settings.CACHES); skipped when it exists
+    call_command('createcachetable', TABLE, database=schema_editor.connection.alias, verbosity=0)
+
+
+def drop_cache_table(apps, schema_editor):
+    schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conversations', '0012_conversation_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, drop_cache_table),
+    ]
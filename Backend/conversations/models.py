@@ -6,6 +6,16 @@ class ConversationSession(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sessions')
     started_at = models.DateTimeField(auto_now_add=True)
     title = models.CharField(max_length=255, blank=True)
+    # Rolling summary of messages that have slid out of the LLM context
+    # window, and the id of the newest message it covers
+    summary = models.TextField(blank=True, default='')
+    summarized_through_id = models.IntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pages of a user's sessions, most recent first
+            models.Index(fields=['user', 'started_at', 'id'], name='session_user_started_idx'),
+        ]
 
     def __str__(self):
         return f"Session {self.id} for {self.user.username}"
@@ -20,6 +30,12 @@ class Message(models.Model):
     text = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Message pages, counts and last-message lookups per session
+            models.Index(fields=['session', 'timestamp', 'id'], name='message_session_time_idx'),
+        ]
+
     def __str__(self):
         return f"{self.sender} at {self.timestamp}: {self.text[:30]}"
 
@@ -117,4 +133,50 @@ class EcommerceUser(models.Model):
 
     class Meta:
         managed = False
-        db_table = 'users'
\ No newline at end of file
+        db_table = 'users'
+
+# --- Derived summaries (maintained from the e-commerce tables) ---
+class ProductStock(models.Model):
+    """Unsold inventory per product, kept current by triggers on inventory_items"""
+    product_id = models.IntegerField(primary_key=True)
+    available_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'product_stock'
+
+class ProductCenterStock(models.Model):
+    """Unsold inventory per product and distribution center"""
+    product_id = models.IntegerField()
+    distribution_center_id = models.IntegerField()
+    available_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'product_center_stock'
+        unique_together = [('product_id', 'distribution_center_id')]
+
+class ProductDailySales(models.Model):
+    """Daily order_items count per product, rolled up for trending queries"""
+    day = models.DateField()
+    product_id = models.IntegerField()
+    order_count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'product_daily_sales'
+        unique_together = [('day', 'product_id')]
+
+class UserPreferenceProfile(models.Model):
+    """Precomputed shopping profile per e-commerce user, built from recent order items"""
+    user_id = models.IntegerField(primary_key=True)
+    favorite_categories = models.JSONField(default=list)
+    favorite_brands = models.JSONField(default=list)
+    min_price = models.FloatField(default=0)
+    max_price = models.FloatField(default=0)
+    avg_price = models.FloatField(default=0)
+    total_orders = models.IntegerField(default=0)
+    total_spent = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'user_preference_profiles'
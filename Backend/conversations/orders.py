@@ -0,0 +1,44 @@
+from django.db import connection
+
+from .models import EcommerceUser
+from .pagination import clamp_limit
+
+DEFAULT_HISTORY_LIMIT = 5
+
+# order_items ⋈ products (⋈ orders) in one round trip. Served by the
+# order_items (user_id, created_at DESC) index, so a page costs the same
+# no matter how long the user's history is.
+ORDER_HISTORY_SQL = """
+SELECT oi.id, oi.order_id, oi.product_id, oi.status, oi.created_at,
+       oi.shipped_at, oi.delivered_at, oi.returned_at,
+       p.name, p.brand, p.category, p.retail_price,
+       o.status AS order_status, o.num_of_item
+FROM order_items oi
+JOIN products p ON p.id = oi.product_id
+LEFT JOIN orders o ON o.order_id = oi.order_id
+WHERE oi.user_id = %s
+ORDER BY oi.created_at DESC, oi.id DESC
+LIMIT %s OFFSET %s
+"""
+
+
+def get_ecommerce_user_id(django_user):
+    """Match a Django account to its e-commerce user by email"""
+    if not django_user.email:
+        return None
+    return EcommerceUser.objects.filter(email=django_user.email).values_list('id', flat=True).first()
+
+
+def get_order_history(user_id, limit=DEFAULT_HISTORY_LIMIT, offset=0):
+    """A page of a user's order items with product and order details.
+
+    Returns (items, has_more); one extra row is fetched to tell whether
+    another page exists.
+    """
+    limit = clamp_limit(limit, DEFAULT_HISTORY_LIMIT)
+    offset = max(0, int(offset))
+    with connection.cursor() as cursor:
+        cursor.execute(ORDER_HISTORY_SQL, [user_id, limit + 1, offset])
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    return rows[:limit], len(rows) > limit
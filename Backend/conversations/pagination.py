@@ -0,0 +1,136 @@
+import base64
+import json
+
+from django.db.models import Q
+
+# Sort orders accepted by the product search endpoints: (field, descending).
+# id is always the tiebreaker, in the same direction as the sort field, so
+# every order is total and can be resumed from the last row's key.
+SORT_ORDERS = {
+    'price_asc': ('retail_price', False),
+    'price_desc': ('retail_price', True),
+    'name': ('name', False),
+    'brand': ('brand', False),
+    # Only valid on full-text searches, where apply_fulltext annotates rank
+    'relevance': ('rank', True),
+}
+DEFAULT_SORT = 'price_asc'
+
+# Orders for conversation history: sessions most recent first, messages in
+# either direction
+SESSION_ORDERS = {'recent': ('started_at', True)}
+MESSAGE_ORDERS = {
+    'newest': ('timestamp', True),
+    'oldest': ('timestamp', False),
+}
+
+MAX_PAGE_SIZE = 100
+
+NEXT = 'next'
+PREV = 'prev'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def clamp_limit(limit, default):
+    """Page size from a request value, within 1..MAX_PAGE_SIZE"""
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(sort, direction, value, pk):
+    payload = {'s': sort, 'd': direction, 'k': [value, pk]}
+    raw = json.dumps(payload, default=str, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """(direction, value, pk) from an opaque cursor issued for this sort"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        direction = payload['d']
+        value, pk = payload['k']
+        pk = int(pk)
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor('Malformed cursor')
+    if payload.get('s') != sort:
+        raise InvalidCursor('Cursor was issued for a different sort order')
+    if direction not in (NEXT, PREV):
+        raise InvalidCursor('Malformed cursor')
+    return direction, value, pk
+
+
+def ordering(field, descending):
+    return [f'-{field}', '-id'] if descending else [field, 'id']
+
+
+def after_key(field, descending, value, pk):
+    """Rows that follow (value, pk) within the same NULL / non-NULL run.
+
+    The redundant bound on field lets Postgres start an index range scan at
+    the cursor instead of filtering from the first row.
+    """
+    op = 'lt' if descending else 'gt'
+    if value is None:
+        return Q(**{f'{field}__isnull': True, f'id__{op}': pk})
+    bound = 'lte' if descending else 'gte'
+    return Q(**{f'{field}__{bound}': value}) & (
+        Q(**{f'{field}__{op}': value}) | Q(**{f'id__{op}': pk})
+    )
+
+
+def rows_after(queryset, field, descending, value, pk, count):
+    """Up to count rows following (value, pk) in the given order.
+
+    Postgres sorts NULLs last ascending and first descending. Rows after a
+    key in one run are fetched first; the other run is only read when the
+    current one is exhausted and it comes later in this order.
+    """
+    ordered = queryset.order_by(*ordering(field, descending))
+    rows = list(ordered.filter(after_key(field, descending, value, pk))[:count])
+    # NULL run follows the non-NULL run ascending, and precedes it descending
+    next_run_is_null = value is not None and not descending
+    next_run_is_non_null = value is None and descending
+    if len(rows) < count and (next_run_is_null or next_run_is_non_null):
+        rows += list(ordered.filter(**{f'{field}__isnull': next_run_is_null})[:count - len(rows)])
+    return rows
+
+
+def paginate(queryset, sort, limit, cursor=None, orders=SORT_ORDERS):
+    """A keyset page of queryset in the given sort order (a key of orders).
+
+    Returns (rows, next_cursor, prev_cursor); each page costs one or two
+    LIMIT queries regardless of how deep it is.
+    """
+    field, descending = orders[sort]
+
+    if cursor is None:
+        rows = list(queryset.order_by(*ordering(field, descending))[:limit + 1])
+        has_next, has_prev = len(rows) > limit, False
+        rows = rows[:limit]
+    else:
+        direction, value, pk = decode_cursor(cursor, sort)
+        if direction == NEXT:
+            rows = rows_after(queryset, field, descending, value, pk, limit + 1)
+            has_next, has_prev = len(rows) > limit, True
+            rows = rows[:limit]
+        else:
+            # Walk backwards by reversing the order, then restore it
+            rows = rows_after(queryset, field, not descending, value, pk, limit + 1)
+            has_next, has_prev = True, len(rows) > limit
+            rows = rows[:limit][::-1]
+
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, NEXT, getattr(last, field), last.id)
+    if rows and has_prev:
+        first = rows[0]
+        prev_cursor = encode_cursor(sort, PREV, getattr(first, field), first.id)
+    return rows, next_cursor, prev_cursor
@@ -0,0 +1,131 @@
+from django.db import connection, transaction
+
+from .models import UserPreferenceProfile
+
+# Profiles are built from each user's most recent order items
+PREFERENCE_WINDOW = 50
+TOP_PREFERENCES = 5
+
+# GROUPING() levels for the grouping sets in PROFILE_SQL
+CATEGORY_LEVEL = 1
+BRAND_LEVEL = 2
+TOTAL_LEVEL = 3
+
+# Category counts, brand counts and price stats for every user in one pass:
+# the recent window is cut per user with ROW_NUMBER (served by the
+# order_items (user_id, created_at DESC) index), joined to products and
+# aggregated over three grouping sets.
+PROFILE_SQL = """
+WITH recent AS (
+    SELECT user_id, product_id
+    FROM (
+        SELECT oi.user_id, oi.product_id,
+               ROW_NUMBER() OVER (
+                   PARTITION BY oi.user_id ORDER BY oi.created_at DESC, oi.id DESC
+               ) AS position
+        FROM order_items oi
+        WHERE {where}
+    ) ranked
+    WHERE position <= %s
+)
+SELECT r.user_id, p.category, p.brand,
+       GROUPING(p.category, p.brand) AS level,
+       COUNT(*), MIN(p.retail_price), MAX(p.retail_price), SUM(p.retail_price)
+FROM recent r
+JOIN products p ON p.id = r.product_id
+GROUP BY GROUPING SETS ((r.user_id, p.category), (r.user_id, p.brand), (r.user_id))
+"""
+
+
+def empty_profile():
+    return {
+        'favorite_categories': [],
+        'favorite_brands': [],
+        'price_range': {'min': 0, 'max': 0, 'avg': 0},
+        'total_orders': 0,
+        'total_spent': 0,
+    }
+
+
+def top_counts(counts):
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return [{'name': name, 'count': count} for name, count in ranked[:TOP_PREFERENCES]]
+
+
+def build_profiles(rows):
+    """Fold PROFILE_SQL rows into a profile dict per user id"""
+    categories, brands, profiles = {}, {}, {}
+    for user_id, category, brand, level, count, min_price, max_price, total in rows:
+        if level == CATEGORY_LEVEL and category is not None:
+            categories.setdefault(user_id, {})[category] = count
+        elif level == BRAND_LEVEL and brand is not None:
+            brands.setdefault(user_id, {})[brand] = count
+        elif level == TOTAL_LEVEL:
+            profile = empty_profile()
+            profile['price_range'] = {
+                'min': float(min_price or 0),
+                'max': float(max_price or 0),
+                'avg': float(total or 0) / count,
+            }
+            profile['total_orders'] = count
+            profile['total_spent'] = float(total or 0)
+            profiles[user_id] = profile
+
+    for user_id, profile in profiles.items():
+        profile['favorite_categories'] = top_counts(categories.get(user_id, {}))
+        profile['favorite_brands'] = top_counts(brands.get(user_id, {}))
+    return profiles
+
+
+def compute_profiles(where, params, window=PREFERENCE_WINDOW):
+    with connection.cursor() as cursor:
+        cursor.execute(PROFILE_SQL.format(where=where), [*params, window])
+        return build_profiles(cursor.fetchall())
+
+
+def compute_profile(user_id, window=PREFERENCE_WINDOW):
+    """A user's preference profile from one aggregate query, or None without orders"""
+    return compute_profiles('oi.user_id = %s', [user_id], window).get(user_id)
+
+
+def get_stored_profile(user_id):
+    """The precomputed profile for a user, or None if it has not been built"""
+    stored = UserPreferenceProfile.objects.filter(user_id=user_id).first()
+    if stored is None:
+        return None
+    return {
+        'favorite_categories': stored.favorite_categories,
+        'favorite_brands': stored.favorite_brands,
+        'price_range': {'min': stored.min_price, 'max': stored.max_price, 'avg': stored.avg_price},
+        'total_orders': stored.total_orders,
+        'total_spent': stored.total_spent,
+    }
+
+
+def refresh_profiles(first_user_id, last_user_id, window=PREFERENCE_WINDOW):
+    """Rebuild stored profiles for user ids in [first_user_id, last_user_id].
+
+    Returns the number of profiles written.
+    """
+    profiles = compute_profiles(
+        'oi.user_id BETWEEN %s AND %s', [first_user_id, last_user_id], window
+    )
+    rows = [
+        UserPreferenceProfile(
+            user_id=user_id,
+            favorite_categories=profile['favorite_categories'],
+            favorite_brands=profile['favorite_brands'],
+            min_price=profile['price_range']['min'],
+            max_price=profile['price_range']['max'],
+            avg_price=profile['price_range']['avg'],
+            total_orders=profile['total_orders'],
+            total_spent=profile['total_spent'],
+        )
+        for user_id, profile in profiles.items()
+    ]
+    with transaction.atomic():
+        UserPreferenceProfile.objects.filter(
+            user_id__gte=first_user_id, user_id__lte=last_user_id
+        ).delete()
+        UserPreferenceProfile.objects.bulk_create(rows)
+    return len(rows)
@@ -0,0 +1,73 @@
+import random
+
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+
+# Indexed uniform key on products (migration 0009), exposed without adding
+# a field to the unmanaged Product model
+RANDOM_KEY = RawSQL('"products"."random_key"', [], output_field=FloatField())
+
+
+# A sample is drawn from up to this many windows with independent random
+# starting keys, so rows adjacent on random_key don't always come back together
+SAMPLE_WINDOWS = 4
+
+
+def window_sizes(k, windows=SAMPLE_WINDOWS):
+    windows = max(1, min(windows, k))
+    return [k // windows + (1 if i < k % windows else 0) for i in range(windows)]
+
+
+def windows_query(keyed, sizes, rng):
+    """One UNION ALL query over every window's two index probes: the rows
+    after its start, then the rows it wraps around to. Each row's part says
+    which window and probe it came from.
+    """
+    probes = []
+    for window, size in enumerate(sizes):
+        start = rng.random()
+        probes.append(keyed.filter(random_key__gte=start).annotate(part=Value(2 * window))[:size])
+        probes.append(keyed.filter(random_key__lt=start).annotate(part=Value(2 * window + 1))[:size])
+    return probes[0].union(*probes[1:], all=True)
+
+
+def sample_products(queryset, k, seed=None, windows=SAMPLE_WINDOWS):
+    """k random products from a Product queryset without sorting the table.
+
+    Keys are independent uniform values, so the matching rows that follow a
+    random starting key are a uniform sample. The sample is split across
+    several windows, each walking the random_key index from its own starting
+    point (wrapping around once) and stopping after its share of matches, so
+    each reads about share / selectivity rows instead of the whole filtered
+    table. All windows go out as one UNION ALL query. Pass seed for
+    reproducible samples.
+    """
+    rng = random.Random(seed)
+    keyed = queryset.alias(random_key=RANDOM_KEY).order_by('random_key')
+    sizes = window_sizes(k, windows)
+    rows = list(windows_query(keyed, sizes, rng))
+
+    parts = {}
+    for product in rows:
+        parts.setdefault(product.part, []).append(product)
+    picked = {}
+    for window, size in enumerate(sizes):
+        window_rows = (parts.get(2 * window, []) + parts.get(2 * window + 1, []))[:size]
+        for product in window_rows:
+            picked.setdefault(product.id, product)
+    # Overlapping windows repeat rows; the spare rows the probes returned
+    # fill the gap before any extra query is needed
+    for product in rows:
+        if len(picked) >= k:
+            break
+        picked.setdefault(product.id, product)
+    if len(picked) < k:
+        start = rng.random()
+        rest = keyed.exclude(id__in=list(picked))
+        for probe in (rest.filter(random_key__gte=start), rest.filter(random_key__lt=start)):
+            for product in probe[:k - len(picked)]:
+                picked[product.id] = product
+
+    products = sorted(picked.values(), key=lambda product: product.id)
+    rng.shuffle(products)
+    return products
@@ -0,0 +1,92 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+from django.db.models.expressions import RawSQL
+
+# Brand values the chat model and clients send to mean "no brand filter"
+ANY_BRAND = ('all', 'any', '')
+
+# Search modes accepted by the product search endpoint
+FILTER_MODE = 'filter'
+FULLTEXT_MODE = 'fulltext'
+SEARCH_MODES = (FILTER_MODE, FULLTEXT_MODE)
+
+# Columns that carry pg_trgm GIN indexes (migration 0004). Django compiles
+# icontains on Postgres to UPPER("col"::text) LIKE UPPER('%x%'), which is
+# exactly the indexed expression, so substring filters on these columns are
+# answered from the trigram index instead of a sequential scan.
+TRIGRAM_FIELDS = ('name', 'brand', 'category')
+
+
+def substring_match(field, value):
+    """Case-insensitive substring filter routed through the trigram indexes"""
+    if field not in TRIGRAM_FIELDS:
+        raise ValueError(f"No trigram index on products.{field}")
+    return Q(**{f'{field}__icontains': value.strip()})
+
+
+def any_substring_match(field, values):
+    """OR together substring filters on one field (e.g. several categories)"""
+    filters = Q()
+    for value in values:
+        if value and value.strip():
+            filters |= substring_match(field, value)
+    return filters
+
+
+def text_query_match(query):
+    """Free-text query matched against name, brand and category"""
+    return (
+        substring_match('name', query) |
+        substring_match('brand', query) |
+        substring_match('category', query)
+    )
+
+
+def build_product_filters(category=None, brand=None, department=None,
+                          min_price=None, max_price=None, query=None):
+    """Build the product filter shared by the chat and product search views"""
+    filters = Q()
+
+    if category:
+        filters &= substring_match('category', category)
+    if brand and brand.strip().lower() not in ANY_BRAND:
+        filters &= substring_match('brand', brand)
+    if department:
+        filters &= Q(department=department)
+    if min_price:
+        filters &= Q(retail_price__gte=float(min_price))
+    if max_price:
+        filters &= Q(retail_price__lte=float(max_price))
+    if query:
+        filters &= text_query_match(query)
+
+    return filters
+
+
+def fulltext_query(text):
+    """Prefix-matching tsquery for free text, e.g. "levi jea" -> levi:* & jea:*"""
+    terms = re.findall(r'\w+', text.lower())
+    if not terms:
+        return None
+    raw = ' & '.join(f'{term}:*' for term in terms)
+    return SearchQuery(raw, search_type='raw', config='english')
+
+
+def apply_fulltext(queryset, text):
+    """Restrict products to a full-text match on the stored search_vector,
+    ranked with ts_rank (name > brand > category weights, migration 0005)
+    """
+    query = fulltext_query(text)
+    if query is None:
+        return queryset
+    # search_vector is a generated column that isn't declared on the
+    # unmanaged Product model, so it is only selected when searching.
+    vector = RawSQL('"products"."search_vector"', [], output_field=SearchVectorField())
+    # ts_rank returns real; as double precision the value survives a round
+    # trip through a pagination cursor exactly
+    return queryset.alias(search_vector=vector).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query), FloatField()),
+    ).filter(search_vector=query).order_by('-rank', 'id')
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import ConversationSession, Message, Product, InventoryItem, Order, OrderItem, EcommerceUser
+from .inventory import get_available_count, get_available_counts, LOW_STOCK_THRESHOLD
 
 class MessageSerializer(serializers.ModelSerializer):
     class Meta:
@@ -13,6 +14,33 @@ class ConversationSessionSerializer(serializers.ModelSerializer):
         model = ConversationSession
         fields = ['id', 'user', 'started_at', 'title', 'messages']
 
+class ConversationSummarySerializer(serializers.ModelSerializer):
+    """Sidebar entry for a session annotated by history.session_summaries"""
+    created_at = serializers.DateTimeField(source='started_at', read_only=True)
+    updated_at = serializers.SerializerMethodField()
+    message_count = serializers.IntegerField(read_only=True)
+    last_message_preview = serializers.CharField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = ConversationSession
+        fields = [
+            'id', 'title', 'started_at', 'created_at', 'updated_at',
+            'message_count', 'last_message_preview'
+        ]
+
+    def get_updated_at(self, obj):
+        """Time of the last message, or the start of an empty session"""
+        updated_at = obj.last_message_at or obj.started_at
+        return serializers.DateTimeField().to_representation(updated_at)
+
+class ProductListSerializer(serializers.ListSerializer):
+    """Serializes a page of products with one availability lookup for the whole page"""
+
+    def to_representation(self, data):
+        products = list(data.all() if hasattr(data, 'all') else data)
+        self.available_counts = get_available_counts(product.id for product in products)
+        return super().to_representation(products)
+
 class ProductSerializer(serializers.ModelSerializer):
     """Serializer for product data with additional computed fields"""
     availability_status = serializers.SerializerMethodField()
@@ -25,15 +53,18 @@ class ProductSerializer(serializers.ModelSerializer):
             'retail_price', 'formatted_price', 'sku', 
             'availability_status'
         ]
+        list_serializer_class = ProductListSerializer
     
     def get_availability_status(self, obj):
-        """Get real-time availability status"""
-        available_count = InventoryItem.objects.filter(
-            product_id=obj.id,
-            sold_at__isnull=True
-        ).count()
+        """Get availability status from the product_stock summary"""
+        # Counts are prefetched for the whole page when serializing many=True
+        page_counts = getattr(self.parent, 'available_counts', None)
+        if page_counts is not None and obj.id in page_counts:
+            available_count = page_counts[obj.id]
+        else:
+            available_count = get_available_count(obj.id)
         
-        if available_count > 10:
+        if available_count > LOW_STOCK_THRESHOLD:
             return {"status": "in_stock", "message": "In Stock", "count": available_count}
         elif available_count > 0:
             return {"status": "low_stock", "message": f"Only {available_count} left!", "count": available_count}
@@ -64,6 +95,14 @@ class OrderSerializer(serializers.ModelSerializer):
             'num_of_item'
         ]
 
+class OrderItemListSerializer(serializers.ListSerializer):
+    """Serializes order items with one product lookup for the whole list"""
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, 'all') else data)
+        self.products = Product.objects.in_bulk({item.product_id for item in items})
+        return super().to_representation(items)
+
 class OrderItemSerializer(serializers.ModelSerializer):
     """Serializer for order items with product details"""
     product_details = serializers.SerializerMethodField()
@@ -75,18 +114,24 @@ class OrderItemSerializer(serializers.ModelSerializer):
             'status', 'created_at', 'shipped_at', 'delivered_at', 'returned_at',
             'product_details'
         ]
+        list_serializer_class = OrderItemListSerializer
     
     def get_product_details(self, obj):
         """Get associated product details"""
+        # Products are fetched in bulk when serializing many=True
+        page_products = getattr(self.parent, 'products', None)
         try:
-            product = Product.objects.get(id=obj.product_id)
+            if page_products is not None:
+                product = page_products[obj.product_id]
+            else:
+                product = Product.objects.get(id=obj.product_id)
             return {
                 'name': product.name,
                 'brand': product.brand,
                 'category': product.category,
                 'price': product.retail_price
             }
-        except Product.DoesNotExist:
+        except (KeyError, Product.DoesNotExist):
             return None
 
 class EcommerceUserSerializer(serializers.ModelSerializer):
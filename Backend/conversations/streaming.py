@@ -0,0 +1,81 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+TOKEN = 'token'
+ACTION = 'action'
+CODE_FENCE = '```'
+
+
+def sse_event(event, data):
+    """One server-sent event with a JSON payload"""
+    return f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+
+
+def classify_stream(chunks):
+    """Split a streamed LLM reply into prose and JSON actions.
+
+    Yields (TOKEN, text) for prose as soon as it arrives. A reply whose first
+    non-blank character opens a JSON object (or a ``` fence) is an action:
+    nothing of it is forwarded, and one (ACTION, text) is yielded as soon as
+    the object's braces balance, without reading the rest of the stream.
+    """
+    buffered = ''
+    mode = None
+    depth = 0
+    position = 0
+    in_string = escaped = False
+    try:
+        for chunk in chunks:
+            if mode == TOKEN:
+                yield TOKEN, chunk
+                continue
+            buffered += chunk
+
+            if mode is None:
+                head = buffered.lstrip()
+                if not head or (CODE_FENCE.startswith(head) and head != CODE_FENCE):
+                    # Can't tell yet: blank, or possibly the start of a fence
+                    continue
+                if head.startswith('{') or head.startswith(CODE_FENCE):
+                    mode = ACTION
+                else:
+                    mode = TOKEN
+                    yield TOKEN, buffered
+                    continue
+
+            # Track the object's nesting, ignoring braces inside strings
+            while position < len(buffered):
+                char = buffered[position]
+                position += 1
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif char == '\\':
+                        escaped = True
+                    elif char == '"':
+                        in_string = False
+                elif char == '"' and depth:
+                    in_string = True
+                elif char == '{':
+                    depth += 1
+                elif char == '}' and depth:
+                    depth -= 1
+                    if not depth:
+                        yield ACTION, buffered[:position]
+                        return
+
+        if buffered and mode != TOKEN:
+            # The stream ended first: hand over whatever arrived
+            yield (ACTION if mode == ACTION else TOKEN), buffered
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+
+def result_chunks(text):
+    """A formatted product response split into one part per entry"""
+    parts = text.split('\n\n')
+    chunks = [part + '\n\n' for part in parts[:-1]] + [parts[-1]]
+    return [chunk for chunk in chunks if chunk]
@@ -1,3 +1,1158 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+import threading
+import tracemalloc
+from io import StringIO
+from concurrent.futures import Future, wait as futures_wait
+from unittest import mock
 
-# Create your tests here.
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+import local_data
+from conversations import context, llm
+from conversations.management.commands._mock_llm import mock_llm_upstream
+from conversations.caching import (
+    cached_search, get_generation, invalidate_search_cache, search_cache_stats, search_key
+)
+from conversations.counting import count_results
+from conversations.llm_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from conversations.llm_cache import TTLLRUCache, llm_cache_key, llm_response_cache
+from conversations.models import (
+    ConversationSession, Message, Product, ProductCenterStock, ProductDailySales, ProductStock
+)
+from conversations.pagination import InvalidCursor, decode_cursor, encode_cursor
+from conversations.preferences import build_profiles
+from conversations.sampling import sample_products
+from conversations.serializers import ProductSerializer
+from conversations.streaming import ACTION, TOKEN, classify_stream
+from conversations.trending import refresh_daily_sales
+from conversations.views import ChatAPIView
+
+
+class FakeCursor:
+    """Cursor stand-in that consumes COPY buffers without a database"""
+
+    def __init__(self):
+        self.rows_copied = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchone(self):
+        return None
+
+    def copy_expert(self, sql, buffer):
+        for _ in buffer:
+            self.rows_copied += 1
+
+
+class FakeConnection:
+    def __init__(self):
+        self.cursor_obj = FakeCursor()
+        self.commits = 0
+
+    def cursor(self):
+        return self.cursor_obj
+
+    def commit(self):
+        self.commits += 1
+
+
+class StreamingLoaderMemoryTests(SimpleTestCase):
+    """The chunked loader must keep peak memory bounded by the batch size"""
+
+    ROWS = 100000
+    CHUNK_SIZE = 2000
+    MEMORY_CEILING = 4 * 1024 * 1024  # bytes
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        handle, cls.csv_path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(local_data.TABLE_SPECS['order_items']['columns'])
+            for i in range(1, cls.ROWS + 1):
+                writer.writerow([
+                    i, i // 3, i % 1000, i % 29120, i, 'Complete',
+                    '2023-01-01 10:00:00 UTC', '2023-01-02 10:00:00 UTC',
+                    '' if i % 2 else '2023-01-05 10:00:00 UTC', '',
+                ])
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.csv_path)
+        super().tearDownClass()
+
+    def measure_peak(self, func):
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak
+
+    def load(self, conn, mode):
+        with mock.patch.dict(local_data.CSV_FILES, {'order_items': self.csv_path}):
+            return local_data.load_table(conn, 'order_items', mode, self.CHUNK_SIZE)
+
+    def test_copy_path_stays_under_memory_ceiling(self):
+        conn = FakeConnection()
+        peak = self.measure_peak(lambda: self.load(conn, 'copy'))
+
+        self.assertEqual(conn.cursor_obj.rows_copied, self.ROWS)
+        self.assertLess(peak, self.MEMORY_CEILING)
+
+    def test_insert_path_stays_under_memory_ceiling(self):
+        seen = []
+        fake_insert = lambda cur, df: seen.append(len(df))
+        with mock.patch.dict(local_data.INSERT_FUNCTIONS, {'order_items': fake_insert}):
+            peak = self.measure_peak(lambda: self.load(FakeConnection(), 'insert'))
+
+        self.assertEqual(sum(seen), self.ROWS)
+        self.assertLessEqual(max(seen), self.CHUNK_SIZE)
+        self.assertLess(peak, self.MEMORY_CEILING)
+
+    def test_streaming_peak_is_below_full_file_read(self):
+        full_peak = self.measure_peak(lambda: local_data.pd.read_csv(self.csv_path))
+        streaming_peak = self.measure_peak(lambda: self.load(FakeConnection(), 'copy'))
+
+        self.assertLess(streaming_peak, full_peak / 4)
+
+
+class CheckpointDatabase:
+    """Committed state behind CheckpointConnection: checkpoint rows, stored
+    row hashes and the keys of every row shipped by a committed COPY"""
+
+    def __init__(self):
+        self.checkpoints = {}
+        self.row_hashes = {}
+        self.shipped = []
+
+
+class CheckpointCursor(FakeCursor):
+    def __init__(self, connection):
+        super().__init__()
+        self.connection = connection
+        self.result = None
+        self.staged_hashes = {}
+
+    def execute(self, sql, params=None):
+        self.result = None
+        if 'FROM loader_checkpoints' in sql:
+            row = self.connection.view_checkpoints().get(params[0])
+            self.result = tuple(row) if row else None
+        elif 'INSERT INTO loader_checkpoints' in sql:
+            self.connection.pending_checkpoints[params[0]] = params[1:]
+        elif 'FROM loader_row_hashes' in sql:
+            stored = self.connection.view_row_hashes()
+            table, keys = params
+            self.result = [(key, stored[table, key]) for key in keys if (table, key) in stored]
+        elif 'INSERT INTO loader_row_hashes' in sql:
+            table = params[0]
+            self.connection.pending_row_hashes.update(
+                {(table, key): row_hash for key, row_hash in self.staged_hashes.items()}
+            )
+            self.staged_hashes = {}
+
+    def fetchone(self):
+        return self.result
+
+    def fetchall(self):
+        return self.result
+
+    def copy_expert(self, sql, buffer):
+        if 'staging_row_hashes' in sql:
+            self.staged_hashes.update({int(key): int(row_hash) for key, row_hash in csv.reader(buffer)})
+        else:
+            self.connection.pending_shipped += [int(row[0]) for row in csv.reader(buffer)]
+
+
+class CheckpointConnection:
+    """Connection stand-in with transactions: a failed commit loses the
+    batch, hashes and checkpoint written since the previous commit"""
+
+    def __init__(self, database, fail_on_commit=None):
+        self.database = database
+        self.fail_on_commit = fail_on_commit
+        self.commits = 0
+        self.rollback()
+
+    def view_checkpoints(self):
+        return {**self.database.checkpoints, **self.pending_checkpoints}
+
+    def view_row_hashes(self):
+        return {**self.database.row_hashes, **self.pending_row_hashes}
+
+    def cursor(self):
+        return CheckpointCursor(self)
+
+    def rollback(self):
+        self.pending_checkpoints, self.pending_row_hashes, self.pending_shipped = {}, {}, []
+
+    def commit(self):
+        self.commits += 1
+        if self.commits == self.fail_on_commit:
+            self.rollback()
+            raise RuntimeError('connection lost')
+        self.database.checkpoints.update(self.pending_checkpoints)
+        self.database.row_hashes.update(self.pending_row_hashes)
+        self.database.shipped += self.pending_shipped
+        self.rollback()
+
+
+class IncrementalLoaderTests(SimpleTestCase):
+    """Incremental loads ship each new or changed row once, across re-runs
+    and resumed crashes"""
+
+    CHUNK_SIZE = 2
+
+    def setUp(self):
+        handle, self.csv_path = tempfile.mkstemp(suffix='.csv')
+        os.close(handle)
+        self.addCleanup(os.remove, self.csv_path)
+        self.database = CheckpointDatabase()
+        self.rows = {
+            order_id: [order_id, 10, 'Complete', 'F', f'2024-01-0{order_id} 10:00:00 UTC', '', '', '', 1]
+            for order_id in range(1, 8)
+        }
+
+    def write_csv(self):
+        with open(self.csv_path, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(local_data.TABLE_SPECS['orders']['columns'])
+            writer.writerows(self.rows.values())
+
+    def load(self, fail_on_commit=None):
+        conn = CheckpointConnection(self.database, fail_on_commit)
+        shipped_before = len(self.database.shipped)
+        with mock.patch.dict(local_data.CSV_FILES, {'orders': self.csv_path}), \
+                mock.patch('builtins.print'):
+            local_data.load_table_incremental(conn, 'orders', self.CHUNK_SIZE)
+        return self.database.shipped[shipped_before:]
+
+    def test_rerun_of_unchanged_file_ships_nothing(self):
+        self.write_csv()
+        self.assertEqual(self.load(), list(range(1, 8)))
+        self.assertEqual(self.load(), [])
+
+    def test_new_and_changed_rows_are_picked_up(self):
+        self.write_csv()
+        self.load()
+
+        self.rows[3][6] = '2024-02-01 09:00:00 UTC'  # shipped_at set later
+        self.rows[8] = [8, 11, 'Processing', 'M', '2024-01-08 10:00:00 UTC', '', '', '', 2]
+        self.write_csv()
+
+        self.assertEqual(self.load(), [3, 8])
+        self.assertEqual(self.load(), [])
+
+    def test_edits_without_timestamp_changes_are_picked_up(self):
+        self.write_csv()
+        self.load()
+
+        self.rows[2][2] = 'Cancelled'  # status only
+        self.rows[5][8] = 3  # num_of_item only
+        self.write_csv()
+
+        self.assertEqual(self.load(), [2, 5])
+        self.assertEqual(self.load(), [])
+
+    def test_resume_after_crash_has_no_duplicates_or_gaps(self):
+        self.write_csv()
+        # The third batch is lost with its checkpoint
+        with self.assertRaises(RuntimeError):
+            self.load(fail_on_commit=3)
+        self.assertEqual(self.database.shipped, [1, 2, 3, 4])
+        self.assertEqual(self.database.checkpoints['orders'][1], 4)  # rows_committed
+
+        self.assertEqual(self.load(), [5, 6, 7])
+        self.assertEqual(sorted(self.database.shipped), list(range(1, 8)))
+        self.assertTrue(self.database.checkpoints['orders'][2])  # completed
+        self.assertEqual(self.load(), [])
+
+
+class FakePool:
+    """ProcessPoolExecutor stand-in that finishes every table immediately"""
+
+    def __init__(self, max_workers):
+        self.submitted = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, func, table, *args):
+        self.submitted.append(table)
+        future = Future()
+        future.set_result((0, 0.0))
+        return future
+
+
+class LoaderCacheInvalidationTests(TestCase):
+    """Loads that touch the catalog invalidate cached product searches"""
+
+    def load(self, table, row):
+        handle, csv_path = tempfile.mkstemp(suffix='.csv')
+        self.addCleanup(os.remove, csv_path)
+        with os.fdopen(handle, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(local_data.TABLE_SPECS[table]['columns'])
+            writer.writerow(row)
+        with mock.patch.dict(local_data.CSV_FILES, {table: csv_path}), mock.patch('builtins.print'):
+            local_data.load_table(FakeConnection(), table, 'copy')
+
+    def test_product_load_changes_generation(self):
+        generation = get_generation()
+        self.load('products', [1, '5.00', 'Jeans', 'Slim Jean', 'Levi\'s', '19.99', 'Women', 'SKU1', 1])
+        self.assertNotEqual(get_generation(), generation)
+
+    def test_other_tables_leave_cache_alone(self):
+        generation = get_generation()
+        self.load('distribution_centers', [1, 'Memphis TN', '35.1174', '-89.9711'])
+        self.assertEqual(get_generation(), generation)
+
+
+class ParallelLoaderTests(SimpleTestCase):
+    """Tables with no foreign keys between them are loaded at the same time"""
+
+    def run_loader(self, ordered):
+        pools, submitted_at_wait = [], []
+
+        def make_pool(max_workers):
+            pools.append(FakePool(max_workers))
+            return pools[-1]
+
+        def record_wait(futures, return_when):
+            submitted_at_wait.append(len(pools[0].submitted))
+            return futures_wait(futures, return_when=return_when)
+
+        with mock.patch.object(local_data, 'ProcessPoolExecutor', make_pool), \
+                mock.patch.object(local_data, 'wait', record_wait):
+            results = local_data.load_tables_parallel(local_data.LOAD_ORDER, 'copy', workers=6, ordered=ordered)
+        self.assertEqual(set(results), set(local_data.LOAD_ORDER))
+        return pools[0].submitted, submitted_at_wait
+
+    def test_independent_tables_are_submitted_together(self):
+        submitted, submitted_at_wait = self.run_loader(ordered=False)
+        # Every table is in the pool before the loader waits on the first one
+        self.assertEqual(submitted_at_wait[0], len(local_data.LOAD_ORDER))
+
+    def test_ordered_loads_wait_for_referenced_tables(self):
+        submitted, submitted_at_wait = self.run_loader(ordered=True)
+        self.assertLess(submitted_at_wait[0], len(local_data.LOAD_ORDER))
+        self.assertLess(submitted.index('orders'), submitted.index('order_items'))
+
+
+class ProductSerializerAvailabilityTests(TestCase):
+    """Availability for a page of products costs one query regardless of page size"""
+
+    def make_products(self, count):
+        # Products are unmanaged, so unsaved instances stand in for table rows
+        return [
+            Product(
+                id=i, cost=Decimal('5.00'), category='Jeans', name=f'Jean {i}',
+                brand='Levi\'s', retail_price=Decimal('19.99'), department='Women',
+                sku=f'SKU{i}', distribution_center_id=1,
+            )
+            for i in range(1, count + 1)
+        ]
+
+    def setUp(self):
+        ProductStock.objects.bulk_create([
+            ProductStock(product_id=1, available_count=25),
+            ProductStock(product_id=2, available_count=3),
+        ])
+
+    def test_query_count_is_constant_in_page_size(self):
+        for page_size in (1, 20, 100):
+            products = self.make_products(page_size)
+            with self.assertNumQueries(1):
+                data = ProductSerializer(products, many=True).data
+            self.assertEqual(len(data), page_size)
+
+    def test_availability_is_injected_per_row(self):
+        data = ProductSerializer(self.make_products(3), many=True).data
+
+        self.assertEqual(data[0]['availability_status']['status'], 'in_stock')
+        self.assertEqual(data[1]['availability_status'], {
+            'status': 'low_stock', 'message': 'Only 3 left!', 'count': 3,
+        })
+        self.assertEqual(data[2]['availability_status']['status'], 'out_of_stock')
+
+    def test_single_product_still_serializes(self):
+        with self.assertNumQueries(1):
+            data = ProductSerializer(self.make_products(1)[0]).data
+        self.assertEqual(data['availability_status']['count'], 25)
+
+    def test_chat_product_response_queries_are_constant(self):
+        view = ChatAPIView()
+        with self.assertNumQueries(1):
+            one = view.format_product_response(self.make_products(1))
+        with self.assertNumQueries(1):
+            many = view.format_product_response(self.make_products(50))
+
+        self.assertIn('✅ In Stock', one)
+        self.assertIn('⚠️ Only 3 left!', many)
+        self.assertIn('50. **Jean 50**', many)
+
+
+class RebuildProductStockTests(TestCase):
+    """The bulk rebuild counts unsold inventory per product and center"""
+
+    def test_rebuild_counts_unsold_items(self):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE inventory_items (
+                    id integer PRIMARY KEY, product_id integer, sold_at timestamp,
+                    product_distribution_center_id integer
+                )
+            """)
+            cursor.execute("""
+                INSERT INTO inventory_items VALUES
+                    (1, 1, NULL, 1), (2, 1, NULL, 2), (3, 1, '2025-01-01', 1), (4, 2, NULL, NULL)
+            """)
+        call_command('rebuild_product_stock', stdout=StringIO())
+
+        self.assertEqual(dict(ProductStock.objects.values_list('product_id', 'available_count')), {1: 2, 2: 1})
+        self.assertEqual(
+            sorted(ProductCenterStock.objects.values_list('product_id', 'distribution_center_id', 'available_count')),
+            [(1, 1, 1), (1, 2, 1)],
+        )
+
+
+class TrigramIndexCommandTests(TestCase):
+    """Missing trigram indexes can be built after migrating, or fail loudly"""
+
+    def create_products_table(self):
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE products (id integer PRIMARY KEY, name text, brand text, category text)')
+
+    def test_requires_products_table(self):
+        with self.assertRaisesMessage(CommandError, 'products does not exist'):
+            call_command('create_trigram_indexes')
+
+    def test_reports_missing_extension(self):
+        self.create_products_table()
+        with mock.patch('conversations.trigram.trigram_available', return_value=False):
+            with self.assertRaisesMessage(CommandError, 'pg_trgm is not available'):
+                call_command('create_trigram_indexes')
+
+
+class PartitionRoundTripTests(TestCase):
+    """Reloading into a partitioned table neither duplicates nor loses rows"""
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE order_items (
+                    id SERIAL PRIMARY KEY, order_id INTEGER, user_id INTEGER,
+                    product_id INTEGER, inventory_item_id INTEGER, status VARCHAR(50),
+                    created_at TIMESTAMP, shipped_at TIMESTAMP,
+                    delivered_at TIMESTAMP, returned_at TIMESTAMP
+                )
+            """)
+        columns = local_data.TABLE_SPECS['order_items']['columns']
+        self.rows = local_data.pd.DataFrame([
+            [1, 1, 1, 1, 1, 'Complete', '2025-01-05 10:00:00', None, None, None],
+            [2, 1, 1, 2, 2, 'Complete', '2025-02-05 10:00:00', None, None, None],
+            [3, 2, 2, 3, 3, 'Processing', None, None, None, None],
+        ], columns=columns)
+
+    def load(self, frame, update_existing=False):
+        with connection.cursor() as cursor:
+            local_data.copy_table(cursor, 'order_items', frame, update_existing)
+            cursor.execute('SELECT id, status, created_at FROM order_items ORDER BY id')
+            return cursor.fetchall()
+
+    def test_convert_then_reload(self):
+        before = self.load(self.rows)
+        call_command('partition_tables', '--convert', '--tables', 'order_items', stdout=StringIO())
+
+        self.assertEqual(self.load(self.rows), before)
+
+        changed = self.rows.copy()
+        changed.loc[2, 'status'] = 'Shipped'  # the row with no created_at
+        changed.loc[0, 'created_at'] = '2025-03-01 08:00:00'  # moves partition
+        after = self.load(changed, update_existing=True)
+        self.assertEqual([(row[0], row[1]) for row in after], [(1, 'Complete'), (2, 'Complete'), (3, 'Shipped')])
+        self.assertEqual(after[0][2].month, 3)
+
+    def test_insert_mode_reload_after_convert(self):
+        self.load(self.rows)
+        call_command('partition_tables', '--convert', '--tables', 'order_items', stdout=StringIO())
+
+        with connection.cursor() as cursor:
+            local_data.insert_order_items(cursor, self.rows)
+            cursor.execute('SELECT id FROM order_items ORDER BY id')
+            self.assertEqual([row[0] for row in cursor.fetchall()], [1, 2, 3])
+
+
+class TrendingRollupTests(TestCase):
+    """The daily sales rollup skips order items it has no day for"""
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE order_items (
+                    id SERIAL PRIMARY KEY, order_id INTEGER, user_id INTEGER,
+                    product_id INTEGER, inventory_item_id INTEGER, status VARCHAR(50),
+                    created_at TIMESTAMP, shipped_at TIMESTAMP,
+                    delivered_at TIMESTAMP, returned_at TIMESTAMP
+                )
+            """)
+            cursor.execute("""
+                INSERT INTO order_items (product_id, status, created_at) VALUES
+                    (1, 'Complete', '2025-01-05 10:00:00'),
+                    (1, 'Complete', '2025-01-05 18:00:00'),
+                    (2, 'Complete', '2025-01-06 09:00:00'),
+                    (2, 'Processing', NULL),
+                    (NULL, 'Complete', '2025-01-06 11:00:00')
+            """)
+
+    def rollup(self):
+        return sorted(ProductDailySales.objects.values_list('day', 'product_id', 'order_count'))
+
+    def test_full_refresh_skips_items_without_a_day(self):
+        call_command('refresh_trending_rollup', '--full', stdout=StringIO())
+        self.assertEqual(self.rollup(), [
+            (date(2025, 1, 5), 1, 2),
+            (date(2025, 1, 6), 2, 1),
+        ])
+
+    def test_first_refresh_rebuilds_everything(self):
+        self.assertIsNone(refresh_daily_sales())
+        self.assertEqual(len(self.rollup()), 2)
+
+    def test_order_items_load_refreshes_rollup(self):
+        handle, csv_path = tempfile.mkstemp(suffix='.csv')
+        self.addCleanup(os.remove, csv_path)
+        with os.fdopen(handle, 'w', newline='') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(local_data.TABLE_SPECS['order_items']['columns'])
+            writer.writerow([6, 3, 1, 3, 3, 'Complete', '2025-01-07 10:00:00', '', '', ''])
+        with mock.patch.dict(local_data.CSV_FILES, {'order_items': csv_path}), \
+                mock.patch('conversations.trending.refresh_daily_sales') as refresh, \
+                mock.patch('builtins.print'):
+            local_data.load_table(FakeConnection(), 'order_items', 'copy')
+        refresh.assert_called_once_with(full=True)
+
+
+class SampleProductsTests(TestCase):
+    """Seeded samples are reproducible and spread over the random_key order"""
+
+    ROWS = 200
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE products (
+                    id integer PRIMARY KEY, cost numeric(10, 2), category varchar(255),
+                    name varchar(255), brand varchar(255), retail_price numeric(10, 2),
+                    department varchar(255), sku varchar(255),
+                    distribution_center_id integer, random_key double precision
+                )
+            """)
+            # Fixed keys in a scrambled order, so results don't vary between runs
+            cursor.execute("""
+                INSERT INTO products
+                SELECT i, 5, 'Jeans', 'Jean ' || i, 'Levi''s', 20, 'Women', 'SKU' || i, 1,
+                       ((i * 7919) %% %s)::float / %s
+                FROM generate_series(1, %s) AS i
+            """, [self.ROWS, self.ROWS, self.ROWS])
+            cursor.execute('SELECT id FROM products ORDER BY random_key')
+            self.position = {row[0]: index for index, row in enumerate(cursor.fetchall())}
+
+    def sample_ids(self, k, seed, queryset=None):
+        return [product.id for product in sample_products(Product.objects.all() if queryset is None else queryset, k, seed=seed)]
+
+    def test_fixed_seed_repeats_sample(self):
+        first = self.sample_ids(10, seed=7)
+        self.assertEqual(self.sample_ids(10, seed=7), first)
+        self.assertEqual(len(set(first)), 10)
+        self.assertNotEqual(sorted(self.sample_ids(10, seed=8)), sorted(first))
+
+    def test_sample_spans_several_windows(self):
+        positions = sorted(self.position[pk] for pk in self.sample_ids(12, seed=3))
+        runs = 1 + sum(1 for a, b in zip(positions, positions[1:]) if b != a + 1)
+        self.assertGreater(runs, 1)
+
+    def test_small_table_returns_every_match(self):
+        few = Product.objects.filter(id__lte=3)
+        self.assertEqual(sorted(self.sample_ids(8, seed=1, queryset=few)), [1, 2, 3])
+
+
+class PreferenceProfileTests(SimpleTestCase):
+    """Grouping-set rows fold into the same profile the per-item loop produced"""
+
+    def test_rows_fold_into_profile(self):
+        rows = [
+            (7, 'Jeans', None, 1, 2, Decimal('20'), Decimal('40'), Decimal('60')),
+            (7, 'Swim', None, 1, 1, Decimal('30'), Decimal('30'), Decimal('30')),
+            (7, None, 'Levi\'s', 2, 3, Decimal('20'), Decimal('40'), Decimal('90')),
+            (7, None, None, 3, 3, Decimal('20'), Decimal('40'), Decimal('90')),
+        ]
+        profile = build_profiles(rows)[7]
+
+        self.assertEqual(profile['favorite_categories'], [
+            {'name': 'Jeans', 'count': 2}, {'name': 'Swim', 'count': 1},
+        ])
+        self.assertEqual(profile['favorite_brands'], [{'name': 'Levi\'s', 'count': 3}])
+        self.assertEqual(profile['price_range'], {'min': 20.0, 'max': 40.0, 'avg': 30.0})
+        self.assertEqual(profile['total_orders'], 3)
+        self.assertEqual(profile['total_spent'], 90.0)
+
+
+class PreferencesViewTests(TestCase):
+    """Profiles are looked up by the e-commerce user matched on email"""
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE users (id integer PRIMARY KEY, email varchar(255))')
+            cursor.execute("""
+                CREATE TABLE products (
+                    id integer PRIMARY KEY, cost numeric(10, 2), category varchar(255),
+                    name varchar(255), brand varchar(255), retail_price numeric(10, 2),
+                    department varchar(255), sku varchar(255),
+                    distribution_center_id integer, random_key double precision
+                )
+            """)
+            cursor.execute("""
+                CREATE TABLE order_items (
+                    id integer PRIMARY KEY, order_id integer, user_id integer,
+                    product_id integer, inventory_item_id integer, status varchar(50),
+                    created_at timestamp, shipped_at timestamp,
+                    delivered_at timestamp, returned_at timestamp
+                )
+            """)
+            cursor.execute("INSERT INTO products VALUES (1, 5, 'Jeans', 'Slim Jean', 'Levi''s', 40, 'Women', 'SKU1', 1, 0.5)")
+        self.user = User.objects.create_user('shopper', email='shopper@example.com', password='pw')
+        self.other_id = self.user.id + 100
+        with connection.cursor() as cursor:
+            cursor.execute('INSERT INTO users VALUES (%s, %s)', [self.other_id, 'shopper@example.com'])
+            # Orders under the Django id belong to someone else
+            cursor.execute("""
+                INSERT INTO order_items (id, user_id, product_id, created_at)
+                VALUES (1, %s, 1, '2025-01-05'), (2, %s, 1, '2025-01-06'), (3, %s, 1, '2025-01-07')
+            """, [self.other_id, self.other_id, self.user.id])
+        self.client = APIClient()
+
+    def preferences(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/user/preferences/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['preferences']
+
+    def test_profile_uses_ecommerce_user_id(self):
+        self.assertEqual(self.preferences(self.user)['total_orders'], 2)
+
+    def test_unmatched_account_has_empty_profile(self):
+        stranger = User.objects.create_user('stranger', email='nobody@example.com', password='pw')
+        self.assertEqual(self.preferences(stranger), {})
+
+
+class SearchCursorTests(SimpleTestCase):
+    """Keyset cursors are opaque, round-trip their key and are bound to a sort"""
+
+    def test_cursor_round_trips_key(self):
+        cursor = encode_cursor('price_asc', 'next', Decimal('19.99'), 42)
+
+        self.assertNotIn('19.99', cursor)
+        self.assertEqual(decode_cursor(cursor, 'price_asc'), ('next', '19.99', 42))
+
+    def test_null_sort_key_round_trips(self):
+        cursor = encode_cursor('name', 'prev', None, 7)
+        self.assertEqual(decode_cursor(cursor, 'name'), ('prev', None, 7))
+
+    def test_cursor_rejected_for_other_sort(self):
+        cursor = encode_cursor('name', 'next', 'Jeans', 1)
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(cursor, 'brand')
+
+    def test_malformed_cursor_rejected(self):
+        with self.assertRaises(InvalidCursor):
+            decode_cursor('not-a-cursor', 'name')
+
+
+class CountModeTests(TestCase):
+    """Non-exact count modes say so in count_is_exact"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create(username='counter')
+        ConversationSession.objects.bulk_create(
+            [ConversationSession(user=user) for _ in range(5)]
+        )
+        self.sessions = ConversationSession.objects.all()
+
+    def test_capped_count_stops_at_cap(self):
+        self.assertEqual(count_results(self.sessions, 'capped', cap=3), (3, False))
+        self.assertEqual(count_results(self.sessions, 'capped', cap=5), (5, True))
+
+    def test_cached_count_is_reused(self):
+        self.assertEqual(count_results(self.sessions, 'cached'), (5, True))
+        with self.assertNumQueries(0):
+            self.assertEqual(count_results(self.sessions, 'cached'), (5, False))
+
+    def test_exact_count(self):
+        self.assertEqual(count_results(self.sessions, 'exact'), (5, True))
+
+
+class ProductSearchLimitTests(TestCase):
+    """Page limits from the request are clamped rather than trusted"""
+
+    def setUp(self):
+        cache.clear()
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE products (
+                    id integer PRIMARY KEY, cost numeric(10, 2), category varchar(255),
+                    name varchar(255), brand varchar(255), retail_price numeric(10, 2),
+                    department varchar(255), sku varchar(255), distribution_center_id integer
+                )
+            """)
+            cursor.execute("""
+                INSERT INTO products
+                SELECT i, 5, 'Jeans', 'Jean ' || i, 'Levi''s', 20, 'Women', 'SKU' || i, 1
+                FROM generate_series(1, 3) AS i
+            """)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('limits', password='pw'))
+
+    def search(self, limit, method='get'):
+        if method == 'post':
+            response = self.client.post('/api/products/search/', {'limit': limit}, format='json')
+        else:
+            response = self.client.get('/api/products/search/', {'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        return len(response.data['products'])
+
+    def test_invalid_limit_falls_back_to_default(self):
+        self.assertEqual(self.search('abc'), 3)
+        self.assertEqual(self.search('abc', method='post'), 3)
+
+    def test_limit_is_clamped(self):
+        self.assertEqual(self.search(-5), 1)
+        self.assertEqual(self.search(0, method='post'), 1)
+        self.assertEqual(self.search(10 ** 9), 3)
+
+    def test_trending_limit_is_clamped(self):
+        response = self.client.get('/api/products/trending/', {'limit': 'abc'})
+        self.assertEqual(response.status_code, 200)
+
+
+class ConversationHistoryTests(TestCase):
+    """Session list without nested messages, and keyset-paged messages"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='historian')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_sessions(self, count, messages_each):
+        for i in range(count):
+            session = ConversationSession.objects.create(user=self.user, title=f'Chat {i}')
+            Message.objects.bulk_create([
+                Message(session=session, sender='user', text=f'message {j} of chat {i}')
+                for j in range(messages_each)
+            ])
+        return session
+
+    def list_sessions(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/conversations/', {'limit': 5})
+        return response, len(context.captured_queries)
+
+    def test_session_list_query_count_is_constant(self):
+        self.make_sessions(2, 1)
+        small, small_queries = self.list_sessions()
+        self.make_sessions(8, 6)
+        large, large_queries = self.list_sessions()
+
+        self.assertEqual(small_queries, large_queries)
+        self.assertEqual(len(small.data['conversations']), 2)
+        self.assertEqual(len(large.data['conversations']), 5)
+        self.assertIsNotNone(large.data['next_cursor'])
+        newest = large.data['conversations'][0]
+        self.assertEqual(newest['message_count'], 6)
+        self.assertEqual(newest['last_message_preview'], 'message 5 of chat 7')
+        self.assertNotIn('messages', newest)
+
+    def test_messages_are_paged_with_cursors(self):
+        session = self.make_sessions(1, 7)
+        url = f'/api/conversations/{session.id}/messages/'
+
+        texts, cursor = [], None
+        while True:
+            params = {'limit': 3, 'order': 'oldest'}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get(url, params)
+            texts += [message['text'] for message in response.data['messages']]
+            cursor = response.data['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(texts, [f'message {j} of chat 0' for j in range(7)])
+
+    def test_messages_of_other_users_are_hidden(self):
+        other = User.objects.create(username='other')
+        session = ConversationSession.objects.create(user=other)
+        response = self.client.get(f'/api/conversations/{session.id}/messages/')
+        self.assertEqual(response.status_code, 404)
+
+
+class ContextWindowTests(TestCase):
+    """LLM history is bounded by the token budget and older turns are summarized"""
+
+    def setUp(self):
+        user = User.objects.create(username='talker')
+        self.session = ConversationSession.objects.create(user=user)
+
+    def add_turns(self, count, length=400):
+        for i in range(count):
+            Message.objects.create(session=self.session, sender='user', text=f'question {i} ' + 'x' * length)
+            Message.objects.create(session=self.session, sender='ai', text=f'answer {i}\n' + 'y' * length)
+
+    def history_tokens(self, messages):
+        history = [m for m in messages[1:-1] if m['role'] != 'system']
+        return sum(context.estimate_tokens(m['content']) for m in history)
+
+    def test_history_fits_budget_and_keeps_newest(self):
+        self.add_turns(30)
+        messages = context.build_context(self.session, 'next question')
+
+        self.assertLessEqual(self.history_tokens(messages), context.CONTEXT_TOKEN_BUDGET)
+        self.assertTrue(messages[-2]['content'].startswith('answer 29'))
+        self.assertEqual(messages[-1], {'role': 'user', 'content': 'next question'})
+        self.assertEqual(messages[1]['role'], 'system')
+        self.assertIn('Summary of the earlier conversation', messages[1]['content'])
+
+    def test_summary_is_cached_until_window_slides(self):
+        self.add_turns(30)
+        context.build_context(self.session, 'first')
+        self.session.refresh_from_db()
+        summary = self.session.summary
+        self.assertIn('Assistant: answer', summary)
+        self.assertLessEqual(context.estimate_tokens(summary), context.SUMMARY_TOKEN_BUDGET)
+
+        # Nothing new slid out: one read of the tail and no summary write
+        with self.assertNumQueries(1):
+            context.build_context(self.session, 'again')
+
+        self.add_turns(1)
+        context.build_context(self.session, 'later')
+        self.session.refresh_from_db()
+        self.assertNotEqual(self.session.summary, summary)
+
+    def test_backlog_past_the_window_is_folded(self):
+        # Short messages: the history is capped by MAX_CONTEXT_MESSAGES,
+        # leaving 40 older messages that all fit in the summary
+        self.add_turns(30, length=0)
+        context.build_context(self.session, 'next')
+        self.session.refresh_from_db()
+
+        lines = self.session.summary.split('\n')
+        self.assertEqual(len(lines), 40)
+        self.assertEqual(lines[0], 'User: question 0')
+        self.assertEqual(lines[-1], 'Assistant: answer 19')
+
+        # Another 60 messages: the 20 kept before plus 40 new ones slide out
+        self.add_turns(30, length=0)
+        context.build_context(self.session, 'more')
+        self.session.refresh_from_db()
+        newest_first = Message.objects.filter(session=self.session).order_by('-timestamp', '-id')
+        self.assertEqual(self.session.summarized_through_id, newest_first[context.MAX_CONTEXT_MESSAGES].id)
+        self.assertIn('User: question 29\nAssistant: answer 29\nUser: question 0', self.session.summary)
+
+    def test_short_chat_has_no_summary(self):
+        self.add_turns(2, length=10)
+        messages = context.build_context(self.session, 'hi')
+
+        self.assertEqual(len(messages), 6)
+        self.assertEqual(self.session.summary, '')
+
+
+class SearchCacheTests(TestCase):
+    """Equivalent searches share a cache entry until the generation changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return ['result']
+
+    def test_equivalent_params_share_key(self):
+        self.assertEqual(
+            search_key('s', {'min_price': '50', 'brand': '', 'categories': ['Swim', 'Jeans']}),
+            search_key('s', {'categories': ['Jeans', 'Swim'], 'min_price': 50.0, 'query': None}),
+        )
+        self.assertNotEqual(search_key('s', {'department': 'Women'}), search_key('s', {'department': 'Men'}))
+
+    def test_hits_misses_and_invalidation(self):
+        cached_search('s', {'category': 'Jeans'}, self.compute)
+        cached_search('s', {'category': 'Jeans'}, self.compute)
+        self.assertEqual(self.calls, 1)
+
+        invalidate_search_cache()
+        cached_search('s', {'category': 'Jeans'}, self.compute)
+        self.assertEqual(self.calls, 2)
+
+        stats = search_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_generation_is_shared_between_processes(self):
+        generation = invalidate_search_cache()
+        # Another process starts with an empty local cache
+        cache.clear()
+        self.assertEqual(get_generation(), generation)
+
+    def test_status_endpoint_reports_serving_process(self):
+        cached_search('s', {'category': 'Jeans'}, self.compute)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('cache-status', password='pw'))
+        response = client.get('/api/products/search/cache/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['misses'], response.data['generation']), (1, get_generation()))
+
+
+class AsyncChatTests(TestCase):
+    """The async chat endpoint answers through query_llm_async and saves the turn"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='async-chatter')
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    async def test_llm_reply_is_saved(self):
+        # E-commerce tables are unmanaged and absent from the test database
+        with mock.patch.object(ChatAPIView, 'get_user_context', return_value={}), \
+                mock.patch('conversations.async_views.query_llm_async',
+                           mock.AsyncMock(return_value='Try a linen blazer.')) as query:
+            response = await self.async_client.post(
+                '/api/chat/async/', {'text': 'Any tips for a first date?'},
+                content_type='application/json', headers=self.headers,
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['ai_message']['text'], 'Try a linen blazer.')
+        sent = query.call_args[0][0]
+        self.assertEqual(sent[-1], {'role': 'user', 'content': 'Any tips for a first date?'})
+        self.assertEqual(await Message.objects.filter(session__user=self.user).acount(), 2)
+
+    async def test_requires_token(self):
+        response = await self.async_client.post(
+            '/api/chat/async/', {'text': 'hi'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+class PooledLLMClientTests(SimpleTestCase):
+    """query_llm reuses keep-alive connections across calls"""
+
+    MESSAGES = [{'role': 'system', 'content': 'test'}, {'role': 'user', 'content': 'hi'}]
+
+    def test_connections_are_reused(self):
+        with mock_llm_upstream(latency=0) as upstream:
+            before = llm.llm_client_stats()
+            with mock.patch('builtins.print'):
+                for _ in range(5):
+                    llm.query_llm(self.MESSAGES, use_cache=False)
+            after = llm.llm_client_stats()
+
+        self.assertEqual(upstream.requests_served, 5)
+        self.assertEqual(after['requests'] - before['requests'], 5)
+        self.assertEqual(after['connections_opened'] - before['connections_opened'], 1)
+        self.assertEqual(after['reused_requests'] - before['reused_requests'], 4)
+
+    def test_threads_have_own_sessions_but_share_the_pool(self):
+        sessions = []
+
+        def chat():
+            sessions.append(llm.get_llm_session())
+            llm.query_llm(self.MESSAGES, use_cache=False)
+
+        with mock_llm_upstream(latency=0), mock.patch('builtins.print'):
+            before = llm.llm_client_stats()
+            # One thread after another, so each can reuse the last one's connection
+            for _ in range(3):
+                thread = threading.Thread(target=chat)
+                thread.start()
+                thread.join()
+            after = llm.llm_client_stats()
+
+        self.assertEqual(len({id(session) for session in sessions}), 3)
+        self.assertEqual({id(session.get_adapter('http://')) for session in sessions}, {id(llm.get_llm_adapter())})
+        self.assertEqual(after['connections_opened'] - before['connections_opened'], 1)
+
+
+class LLMResponseCacheTests(SimpleTestCase):
+    """Repeated prompts are answered without another upstream call"""
+
+    CONTEXT = {'age': 30, 'gender': 'F', 'location': 'Austin', 'email': 'a@example.com'}
+
+    def setUp(self):
+        llm_response_cache.clear()
+
+    def messages(self, text, history=()):
+        return [{'role': 'system', 'content': 'test'}, *history, {'role': 'user', 'content': text}]
+
+    def test_repeated_prompt_skips_upstream(self):
+        with mock_llm_upstream(latency=0) as upstream, mock.patch('builtins.print'):
+            first = llm.query_llm(self.messages("What's trending?"), self.CONTEXT)
+            second = llm.query_llm(self.messages('  what\'s   TRENDING '), self.CONTEXT)
+            llm.query_llm(self.messages("What's trending?"), self.CONTEXT, use_cache=False)
+
+        self.assertEqual(first, second)
+        self.assertEqual(upstream.requests_served, 2)
+
+    def test_key_depends_on_history_and_context(self):
+        base = llm_cache_key(self.messages('show me jackets'), self.CONTEXT)
+        history = [{'role': 'user', 'content': 'for hiking'}]
+        self.assertNotEqual(base, llm_cache_key(self.messages('show me jackets', history), self.CONTEXT))
+        self.assertNotEqual(base, llm_cache_key(self.messages('show me jackets'), {**self.CONTEXT, 'age': 60}))
+        # Fields that never reach the prompt don't split the cache
+        self.assertEqual(base, llm_cache_key(self.messages('show me jackets'), {**self.CONTEXT, 'email': None}))
+
+    def test_entries_expire_and_least_recent_is_evicted(self):
+        entries = TTLLRUCache(max_entries=2, ttl=60)
+        entries.set('a', 1)
+        entries.set('b', 2)
+        entries.get('a')
+        entries.set('c', 3)
+        self.assertIsNone(entries.get('b'))
+        self.assertEqual(entries.get('a'), 1)
+
+        with mock.patch('conversations.llm_cache.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(entries.get('a'))
+        self.assertEqual(entries.stats()['evictions'], 1)
+
+
+class ChatStreamTests(TestCase):
+    """The streaming chat endpoint forwards prose tokens and saves the turn once"""
+
+    REPLY = 'A navy blazer over a white tee is a safe bet.'
+
+    def setUp(self):
+        llm_response_cache.clear()
+        self.user = User.objects.create(username='streamer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def events(self, response):
+        body = b''.join(response.streaming_content).decode()
+        parsed = []
+        for block in body.strip().split('\n\n'):
+            event, data = block.split('\n')
+            parsed.append((event[len('event: '):], json.loads(data[len('data: '):])))
+        return parsed
+
+    def test_tokens_are_streamed_then_saved(self):
+        with mock_llm_upstream(latency=0, completion=self.REPLY), mock.patch('builtins.print'), \
+                mock.patch.object(ChatAPIView, 'get_user_context', return_value={}):
+            response = self.client.post('/api/chat/stream/', {'text': 'Any tips for a first date?'}, format='json')
+            events = self.events(response)
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        names = [name for name, _ in events]
+        self.assertEqual(names[0], 'start')
+        self.assertEqual(names[-1], 'done')
+        self.assertGreater(names.count('token'), 1)
+        self.assertEqual(''.join(data['text'] for name, data in events if name == 'token'), self.REPLY)
+        self.assertEqual(events[-1][1]['ai_message']['text'], self.REPLY)
+        self.assertEqual(Message.objects.filter(session__user=self.user).count(), 2)
+
+    def test_action_is_detected_without_reading_the_rest(self):
+        chunks = iter(['  {"act', 'ion": "search_products", "query": "{x}"', '}', ' trailing', ' text'])
+        self.assertEqual(
+            list(classify_stream(chunks)),
+            [(ACTION, '  {"action": "search_products", "query": "{x}"}')]
+        )
+        self.assertEqual(list(chunks), [' trailing', ' text'])
+
+        self.assertEqual(list(classify_stream(iter(['Sure', ' thing']))), [(TOKEN, 'Sure'), (TOKEN, ' thing')])
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """A failing upstream is skipped until a probe call succeeds again"""
+
+    MESSAGES = [{'role': 'system', 'content': 'test'}, {'role': 'user', 'content': "What's trending?"}]
+
+    def setUp(self):
+        llm_response_cache.clear()
+        self.now = 0.0
+        self.breaker = CircuitBreaker(window=10, min_calls=4, failure_rate=0.5, slow_call=5,
+                                      slow_rate=0.75, cooldown=30, clock=lambda: self.now)
+
+    def test_trips_probes_and_recovers(self):
+        with mock.patch('builtins.print'):
+            for latency in (0.1, 0.1, 0.1):
+                self.breaker.record_failure(latency)
+            self.breaker.record_success(0.1)
+            self.assertEqual(self.breaker.state, OPEN)
+            self.assertFalse(self.breaker.allow_request())
+
+            self.now = 31
+            self.assertTrue(self.breaker.allow_request())
+            self.assertEqual(self.breaker.state, HALF_OPEN)
+            # Only one probe at a time
+            self.assertFalse(self.breaker.allow_request())
+            self.breaker.record_failure(0.1)
+            self.assertEqual(self.breaker.state, OPEN)
+
+            self.now = 62
+            self.assertTrue(self.breaker.allow_request())
+            self.breaker.record_success(0.1)
+
+        stats = self.breaker.stats()
+        self.assertEqual(stats['state'], CLOSED)
+        self.assertEqual(stats['trips'], 2)
+        self.assertEqual(stats['rejected'], 2)
+
+    def test_slow_calls_trip(self):
+        with mock.patch('builtins.print'):
+            for latency in (6, 7, 8, 0.1):
+                self.breaker.record_success(latency)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_open_breaker_skips_upstream(self):
+        with mock_llm_upstream(latency=0, status=503) as upstream, mock.patch('builtins.print'), \
+                mock.patch.object(llm, 'llm_breaker', self.breaker), \
+                mock.patch.object(llm, 'backoff_delay', return_value=0) as backoff:
+            first = llm.query_llm(self.MESSAGES, max_retries=3)
+            second = llm.query_llm(self.MESSAGES, max_retries=3)
+
+        fallback = llm.create_fallback_response("What's trending?")
+        self.assertEqual((first, second), (fallback, fallback))
+        # The fourth failure trips the breaker; the second call never leaves
+        self.assertEqual(upstream.requests_served, 4)
+        self.assertEqual(backoff.call_count, 3)
+        self.assertEqual(self.breaker.stats()['rejected'], 1)
+
+    def test_backoff_grows_with_jitter_and_cap(self):
+        with mock.patch('conversations.llm.random.uniform', side_effect=lambda low, high: high):
+            self.assertEqual([llm.backoff_delay(n) for n in (1, 2, 3)], [0.5, 1.0, 2.0])
+            self.assertEqual(llm.backoff_delay(10), llm.LLM_BACKOFF_CAP)
+            self.assertEqual(llm.backoff_delay(1, retry_after=3), 3)
@@ -0,0 +1,77 @@
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Sum
+from django.utils import timezone
+
+from .models import Product, ProductDailySales
+from .search import substring_match
+
+# Recompute days from this date onward (inclusive) from order_items
+REFRESH_SQL = """
+INSERT INTO product_daily_sales (day, product_id, order_count)
+SELECT created_at::date, product_id, COUNT(*)
+FROM order_items
+WHERE created_at >= %s AND product_id IS NOT NULL
+GROUP BY created_at::date, product_id
+"""
+
+# Recompute every day; items without a timestamp have no day to count towards
+FULL_REFRESH_SQL = """
+INSERT INTO product_daily_sales (day, product_id, order_count)
+SELECT created_at::date, product_id, COUNT(*)
+FROM order_items
+WHERE created_at IS NOT NULL AND product_id IS NOT NULL
+GROUP BY created_at::date, product_id
+"""
+
+
+def refresh_daily_sales(full=False):
+    """Refresh the product_daily_sales rollup from order_items.
+
+    Only the newest rolled-up day (which may have been partial when it was
+    last computed) and any later days are recomputed, unless full is set.
+    Returns the first day that was recomputed, or None for a full rebuild.
+    """
+    with transaction.atomic():
+        newest_day = None
+        if not full:
+            newest_day = ProductDailySales.objects.order_by('-day').values_list('day', flat=True).first()
+
+        if newest_day is None:
+            ProductDailySales.objects.all().delete()
+            since = None
+        else:
+            ProductDailySales.objects.filter(day__gte=newest_day).delete()
+            since = newest_day
+
+        with connection.cursor() as cursor:
+            if since is None:
+                cursor.execute(FULL_REFRESH_SQL)
+            else:
+                cursor.execute(REFRESH_SQL, [since])
+    return since
+
+
+def get_trending_product_ids(days=30, category=None, limit=10):
+    """Product ids ordered by order count over the last `days` days of the rollup"""
+    since = (timezone.now() - timedelta(days=days)).date()
+    rollup = ProductDailySales.objects.filter(day__gte=since)
+
+    if category and category.lower() != 'all':
+        # Semi-join against products rather than materialising an id list
+        rollup = rollup.filter(Exists(
+            Product.objects.filter(substring_match('category', category), id=OuterRef('product_id'))
+        ))
+
+    trending = rollup.values('product_id').annotate(
+        order_count=Sum('order_count')
+    ).order_by('-order_count', 'product_id')[:limit]
+    return [item['product_id'] for item in trending]
+
+
+def get_trending_products(days=30, category=None, limit=10):
+    """Trending Product objects, most ordered first"""
+    trending_product_ids = get_trending_product_ids(days, category, limit)
+    products_dict = Product.objects.in_bulk(trending_product_ids)
+    return [products_dict[pid] for pid in trending_product_ids if pid in products_dict]
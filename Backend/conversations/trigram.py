@@ -0,0 +1,56 @@
+from django.db import DatabaseError, transaction
+
+# GIN trigram indexes for the substring (icontains) filters on products.
+# The indexed expression matches what Django generates for icontains on
+# Postgres: UPPER("column"::text) LIKE UPPER('%term%').
+CREATE_INDEXES = """
+CREATE INDEX IF NOT EXISTS products_name_trgm_idx
+    ON products USING gin (UPPER(name::text) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS products_brand_trgm_idx
+    ON products USING gin (UPPER(brand::text) gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS products_category_trgm_idx
+    ON products USING gin (UPPER(category::text) gin_trgm_ops);
+ANALYZE products;
+"""
+
+DROP_INDEXES = """
+DROP INDEX IF EXISTS products_name_trgm_idx;
+DROP INDEX IF EXISTS products_brand_trgm_idx;
+DROP INDEX IF EXISTS products_category_trgm_idx;
+"""
+
+
+class TrigramUnavailable(Exception):
+    pass
+
+
+def trigram_available(cursor):
+    cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+    return cursor.fetchone() is not None
+
+
+def create_trigram_indexes(connection):
+    """Enable pg_trgm and build the product trigram indexes.
+
+    Safe to run again: everything is IF NOT EXISTS. Raises
+    TrigramUnavailable when the extension can't be enabled.
+    """
+    with connection.cursor() as cursor:
+        if not trigram_available(cursor):
+            raise TrigramUnavailable(
+                'pg_trgm is not available on this server (install the '
+                'postgresql-contrib package)'
+            )
+        try:
+            # Savepoint, so a refused CREATE EXTENSION doesn't abort the
+            # surrounding transaction
+            with transaction.atomic(using=connection.alias):
+                cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        except DatabaseError as e:
+            raise TrigramUnavailable(f'pg_trgm could not be enabled: {e}'.strip())
+        cursor.execute(CREATE_INDEXES)
+
+
+def drop_trigram_indexes(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(DROP_INDEXES)
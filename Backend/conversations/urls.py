@@ -1,16 +1,24 @@
 from django.urls import path
+from .async_views import async_chat
 from .views import (
-    ChatAPIView, ProductSearchAPIView, TrendingProductsAPIView,
-    UserPreferencesAPIView, ConversationHistoryAPIView
+    ChatAPIView, ChatStreamAPIView, ProductSearchAPIView, TrendingProductsAPIView,
+    UserPreferencesAPIView, ConversationHistoryAPIView, ConversationMessagesAPIView,
+    OrderHistoryAPIView, LLMStatusAPIView, SearchCacheStatusAPIView
 )
 
 urlpatterns = [
     path('chat/', ChatAPIView.as_view(), name='chat'),
+    path('chat/async/', async_chat, name='chat-async'),
+    path('chat/stream/', ChatStreamAPIView.as_view(), name='chat-stream'),
 
     # Additional fashion-specific endpoints
     path('products/search/', ProductSearchAPIView.as_view(), name='product-search'),
+    path('products/search/cache/', SearchCacheStatusAPIView.as_view(), name='search-cache-status'),
     path('products/trending/', TrendingProductsAPIView.as_view(), name='trending-products'),
+    path('llm/status/', LLMStatusAPIView.as_view(), name='llm-status'),
+    path('orders/history/', OrderHistoryAPIView.as_view(), name='order-history'),
     path('user/preferences/', UserPreferencesAPIView.as_view(), name='user-preferences'),
     path('conversations/', ConversationHistoryAPIView.as_view(), name='conversation-history'),
     path('conversations/<int:conversation_id>/', ConversationHistoryAPIView.as_view(), name='conversation-detail'),
+    path('conversations/<int:conversation_id>/messages/', ConversationMessagesAPIView.as_view(), name='conversation-messages'),
 ]
\ No newline at end of file
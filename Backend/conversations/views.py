@@ -1,8 +1,9 @@
 from rest_framework.views import APIView
-from .llm import query_llm, parse_llm_response, extract_fashion_intent
+from .llm import query_llm, stream_llm, parse_llm_response, extract_fashion_intent
 from rest_framework.response import Response
 from rest_framework import status, permissions
 from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
 from django.db.models import Q, Count, Avg
 from django.utils import timezone
 from datetime import datetime, timedelta
@@ -11,15 +12,35 @@ from .models import (
     Order, OrderItem, EcommerceUser
 )
 from .serializers import MessageSerializer, ProductSerializer
+from .inventory import get_available_count, get_available_counts, LOW_STOCK_THRESHOLD
+from .search import build_product_filters, substring_match, any_substring_match
+from .trending import get_trending_products
+from .sampling import sample_products
+from .caching import cached_search
+from .context import build_context
+from .orders import DEFAULT_HISTORY_LIMIT, get_order_history
+from .pagination import clamp_limit
+from .streaming import TOKEN, classify_stream, result_chunks, sse_event
 import json
 import random
 
 # Import the additional view classes
 from .additional_views import (
     ProductSearchAPIView, TrendingProductsAPIView,
-    UserPreferencesAPIView, ConversationHistoryAPIView
+    UserPreferencesAPIView, ConversationHistoryAPIView, ConversationMessagesAPIView,
+    OrderHistoryAPIView, LLMStatusAPIView, SearchCacheStatusAPIView
 )
 
+def wants_llm_cache(data):
+    """Per-request opt-out of the LLM response cache"""
+    value = data.get('cache', True)
+    if isinstance(value, str):
+        return value.strip().lower() not in ('false', '0', 'no', 'off')
+    return bool(value)
+
+# Parameters that shape a chat product search (and its cache key)
+CHAT_SEARCH_PARAMS = ('category', 'brand', 'department', 'min_price', 'max_price', 'query')
+
 class ChatAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -40,112 +61,65 @@ class ChatAPIView(APIView):
 
     def search_products(self, search_params):
         """Advanced product search with multiple filters"""
-        filters = Q()
-        
         print(f"Search params received: {search_params}")  # Debug log
         
-        # Category filter with smart matching
-        if 'category' in search_params and search_params['category']:
-            category = search_params['category']
-            filters &= Q(category__icontains=category)
-            print(f"Applied category filter: {category}")
-        
-        # Brand filter (handle "all" or empty)
-        if 'brand' in search_params and search_params['brand']:
-            brand = search_params['brand']
-            if brand.lower() not in ['all', 'any', '']:
-                filters &= Q(brand__icontains=brand)
-                print(f"Applied brand filter: {brand}")
-        
-        # Department filter
-        if 'department' in search_params and search_params['department']:
-            department = search_params['department']
-            filters &= Q(department=department)
-            print(f"Applied department filter: {department}")
+        # Substring filters on category/brand/name go through the trigram indexes
+        filters = build_product_filters(
+            category=search_params.get('category'),
+            brand=search_params.get('brand'),
+            department=search_params.get('department'),
+            min_price=search_params.get('min_price'),
+            max_price=search_params.get('max_price'),
+            query=search_params.get('query'),
+        )
         
-        # Price range filters
-        if 'min_price' in search_params and search_params['min_price']:
-            min_price = float(search_params['min_price'])
-            filters &= Q(retail_price__gte=min_price)
-            print(f"Applied min_price filter: {min_price}")
-        
-        if 'max_price' in search_params and search_params['max_price']:
-            max_price = float(search_params['max_price'])
-            filters &= Q(retail_price__lte=max_price)
-            print(f"Applied max_price filter: {max_price}")
-        
-        # General query search (search in name, brand, category)
-        if 'query' in search_params and search_params['query']:
-            query = search_params['query']
-            query_filter = (
-                Q(name__icontains=query) | 
-                Q(brand__icontains=query) | 
-                Q(category__icontains=query)
-            )
-            filters &= query_filter
-            print(f"Applied general query filter: {query}")
-        
-        # Execute search
+        # Execute search, evaluating the limited page exactly once; repeated
+        # searches with the same filters are served from the search cache
         print(f"Final filters: {filters}")
-        products = Product.objects.filter(filters).order_by('retail_price')
-        total_count = products.count()
-        print(f"Found {total_count} products")
-        
-        # Limit results
         limit = search_params.get('limit', 8)
-        return products[:limit]
+        cache_params = {name: search_params.get(name) for name in CHAT_SEARCH_PARAMS}
+        cache_params['limit'] = limit
+        products = cached_search('chat-search', cache_params, lambda: list(
+            Product.objects.filter(filters).order_by('retail_price')[:limit]
+        ))
+        print(f"Found {len(products)} products (limit {limit})")
+        return products
+
+    def format_availability(self, available_count):
+        """Human-readable stock label for a unit count"""
+        if available_count > LOW_STOCK_THRESHOLD:
+            return "✅ In Stock"
+        elif available_count > 0:
+            return f"⚠️ Only {available_count} left!"
+        else:
+            return "❌ Out of Stock"
 
     def get_product_availability(self, product_id):
         """Check product availability in inventory"""
         try:
-            available_count = InventoryItem.objects.filter(
-                product_id=product_id,
-                sold_at__isnull=True
-            ).count()
-            
-            if available_count > 10:
-                return "✅ In Stock"
-            elif available_count > 0:
-                return f"⚠️ Only {available_count} left!"
-            else:
-                return "❌ Out of Stock"
+            return self.format_availability(get_available_count(product_id))
         except Exception as e:
             print(f"Error checking availability for product {product_id}: {e}")
             return "📦 Check availability"
 
+    def get_products_availability(self, products):
+        """Availability labels for many products with a single stock lookup"""
+        try:
+            counts = get_available_counts(product.id for product in products)
+            return {pid: self.format_availability(count) for pid, count in counts.items()}
+        except Exception as e:
+            print(f"Error checking availability for products: {e}")
+            return {}
+
     def get_trending_products(self, category=None, limit=6):
         """Get trending products based on recent orders"""
         try:
-            thirty_days_ago = timezone.now() - timedelta(days=30)
-            
-            # Base query for trending products
-            trending_query = OrderItem.objects.filter(
-                created_at__gte=thirty_days_ago
-            ).values('product_id').annotate(
-                order_count=Count('product_id')
-            ).order_by('-order_count')
-            
-            if category and category.lower() != 'all':
-                # Get product IDs for the category first
-                category_products = Product.objects.filter(
-                    category__icontains=category
-                ).values_list('id', flat=True)
-                trending_query = trending_query.filter(product_id__in=category_products)
-            
-            trending_product_ids = [item['product_id'] for item in trending_query[:limit]]
-            
-            # Get the actual product objects
-            products = Product.objects.filter(id__in=trending_product_ids)
-            
-            # Sort by trending order
-            products_dict = {p.id: p for p in products}
-            sorted_products = [products_dict[pid] for pid in trending_product_ids if pid in products_dict]
-            
-            return sorted_products
+            # Summed from the daily rollup (refresh_trending_rollup)
+            return get_trending_products(days=30, category=category, limit=limit)
         except Exception as e:
             print(f"Error getting trending products: {e}")
             # Fallback to random popular products
-            return Product.objects.order_by('?')[:limit]
+            return sample_products(Product.objects.all(), limit)
 
     def get_recommendations(self, style=None, occasion=None, category=None, user_context=None):
         """Generate style-based recommendations"""
@@ -171,7 +145,7 @@ class ChatAPIView(APIView):
         
         # Category specific
         if category:
-            filters &= Q(category__icontains=category)
+            filters &= substring_match('category', category)
         
         # User context filtering
         if user_context and user_context.get('gender'):
@@ -180,49 +154,44 @@ class ChatAPIView(APIView):
             elif user_context['gender'] == 'M':
                 filters &= Q(department='Men')
         
-        products = Product.objects.filter(filters).order_by('?')[:8]  # Random selection
-        print(f"Found {products.count()} recommendation products")
+        products = sample_products(Product.objects.filter(filters), 8)  # Random selection
+        print(f"Found {len(products)} recommendation products")
         return products
 
-    def get_user_order_history(self, user_context, limit=5):
+    def get_user_order_history(self, user_context, limit=DEFAULT_HISTORY_LIMIT):
         """Get user's recent order history"""
         if not user_context or 'user_id' not in user_context:
             return []
         
         try:
-            recent_orders = OrderItem.objects.filter(
-                user_id=user_context['user_id']
-            ).order_by('-created_at')[:limit]
-            
-            order_data = []
-            for order_item in recent_orders:
-                try:
-                    product = Product.objects.get(id=order_item.product_id)
-                    order_data.append({
-                        'product_name': product.name,
-                        'brand': product.brand,
-                        'category': product.category,
-                        'price': product.retail_price,
-                        'status': order_item.status,
-                        'order_date': order_item.created_at
-                    })
-                except Product.DoesNotExist:
-                    continue
-            
-            return order_data
+            # Order items and their products come back from one joined query
+            rows, _ = get_order_history(user_context['user_id'], limit=limit)
+            return [
+                {
+                    'product_name': row['name'],
+                    'brand': row['brand'],
+                    'category': row['category'],
+                    'price': row['retail_price'],
+                    'status': row['status'],
+                    'order_date': row['created_at']
+                }
+                for row in rows
+            ]
         except Exception as e:
             print(f"Error getting order history: {e}")
             return []
 
     def format_product_response(self, products, title="Here are some products I found:"):
         """Format products into a nice response"""
+        products = list(products)
         if not products:
             return "Sorry, I couldn't find any products matching your criteria. Try browsing our popular categories like Jeans, Tops & Tees, or Accessories!"
         
         product_lines = [f"\n🛍️ **{title}**\n"]
+        availability_by_id = self.get_products_availability(products)
         
         for i, product in enumerate(products, 1):
-            availability = self.get_product_availability(product.id)
+            availability = availability_by_id.get(product.id, "📦 Check availability")
             product_lines.append(
                 f"{i}. **{product.name}**\n"
                 f"   👔 {product.brand} • {product.category}\n"
@@ -252,10 +221,10 @@ class ChatAPIView(APIView):
             if query in text_lower:
                 if isinstance(categories, list):
                     # Multiple categories
-                    filters = Q()
-                    for cat in categories:
-                        filters |= Q(category__icontains=cat)
-                    products = Product.objects.filter(filters)[:8]
+                    filters = any_substring_match('category', categories)
+                    products = cached_search('chat-direct', {'categories': categories}, lambda: list(
+                        Product.objects.filter(filters)[:8]
+                    ))
                 else:
                     # Single category
                     products = self.search_products({'category': categories})
@@ -294,20 +263,28 @@ class ChatAPIView(APIView):
         
         return None
 
-    def post(self, request):
-        user = request.user
-        text = request.data.get('text', '').strip()
-        conversation_id = request.data.get('conversation_id')
+    def save_turn(self, session, text, ai_response, user_context):
+        """Persist both sides of a turn and build the chat response payload"""
+        user_msg = Message.objects.create(session=session, sender='user', text=text)
+        ai_msg = Message.objects.create(session=session, sender='ai', text=ai_response)
+        return {
+            'conversation_id': session.id,
+            'user_message': MessageSerializer(user_msg).data,
+            'ai_message': MessageSerializer(ai_msg).data,
+            'user_context': user_context
+        }
 
-        if not text:
-            return Response({'error': 'No message provided'}, status=400)
+    def start_turn(self, user, text, conversation_id):
+        """Everything before the LLM call.
 
+        Returns (session, user_context, payload, messages): payload is the
+        finished response when a direct search answered the message,
+        otherwise messages are what to send to the LLM. Raises
+        ConversationSession.DoesNotExist for someone else's conversation.
+        """
         # Get or create session
         if conversation_id:
-            try:
-                session = ConversationSession.objects.get(id=conversation_id, user=user)
-            except ConversationSession.DoesNotExist:
-                return Response({'error': 'Session not found.'}, status=404)
+            session = ConversationSession.objects.get(id=conversation_id, user=user)
         else:
             session = ConversationSession.objects.create(user=user)
 
@@ -319,36 +296,43 @@ class ChatAPIView(APIView):
         direct_response = self.handle_direct_searches(text, user_context)
         if direct_response:
             # Save messages and return direct response
-            user_msg = Message.objects.create(session=session, sender='user', text=text)
-            ai_msg = Message.objects.create(session=session, sender='ai', text=direct_response)
-            
-            return Response({
-                'conversation_id': session.id,
-                'user_message': MessageSerializer(user_msg).data,
-                'ai_message': MessageSerializer(ai_msg).data,
-                'user_context': user_context
-            }, status=201)
-
-        # Gather conversation history for LLM
-        history = session.messages.order_by('timestamp')
-        messages = [{"role": "system", "content": "You are STYLISTA, a fashion e-commerce assistant."}]
-        
-        for msg in history:
-            messages.append({
-                "role": "user" if msg.sender == "user" else "assistant",
-                "content": msg.text
-            })
+            return session, user_context, self.save_turn(session, text, direct_response, user_context), None
 
-        # Add current user message
-        messages.append({"role": "user", "content": text})
+        # Gather conversation history for LLM: recent turns within the token
+        # budget, older ones via the session's rolling summary
+        messages = build_context(session, text)
+        return session, user_context, None, messages
+
+    def post(self, request):
+        user = request.user
+        text = request.data.get('text', '').strip()
+        conversation_id = request.data.get('conversation_id')
+
+        if not text:
+            return Response({'error': 'No message provided'}, status=400)
 
-        # Query enhanced LLM with user context
-        ai_response = query_llm(messages, user_context)
+        try:
+            session, user_context, payload, messages = self.start_turn(user, text, conversation_id)
+        except ConversationSession.DoesNotExist:
+            return Response({'error': 'Session not found.'}, status=404)
+        if payload:
+            return Response(payload, status=201)
+
+        # Query enhanced LLM with user context; "cache": false in the body
+        # skips the LLM response cache for this turn
+        ai_response = query_llm(messages, user_context, use_cache=wants_llm_cache(request.data))
         print(f"LLM Response: {ai_response}")
 
-        # Save user message
-        user_msg = Message.objects.create(session=session, sender='user', text=text)
+        return Response(self.complete_turn(session, text, user_context, ai_response), status=201)
 
+    def complete_turn(self, session, text, user_context, ai_response):
+        """Everything after the LLM call: run any action, then save the turn"""
+        ai_response = self.resolve_response(text, user_context, ai_response)
+        return self.save_turn(session, text, ai_response, user_context)
+
+    def resolve_response(self, text, user_context, ai_response):
+        """The reply to show for an LLM response: the result of its action,
+        products for the message's intent, or the response itself"""
         # Parse LLM response for actions
         has_json, command = parse_llm_response(ai_response)
         print(f"Parsed command: has_json={has_json}, command={command}")
@@ -401,7 +385,9 @@ class ChatAPIView(APIView):
                         ai_response = "I need a specific product to check inventory. Can you tell me which item you're interested in?"
                 
                 elif action == "order_history":
-                    order_history = self.get_user_order_history(user_context)
+                    order_history = self.get_user_order_history(
+                        user_context, limit=clamp_limit(command.get('limit'), DEFAULT_HISTORY_LIMIT)
+                    )
                     if order_history:
                         history_lines = ["📋 **Your Recent Orders:**\n"]
                         for order in order_history:
@@ -442,12 +428,61 @@ class ChatAPIView(APIView):
                     # If no products found, provide suggestions
                     ai_response = "Sorry, I couldn't find any products matching your criteria. Try browsing our popular categories like Jeans, Tops & Tees, or Accessories!"
 
-        # Save AI response
-        ai_msg = Message.objects.create(session=session, sender='ai', text=ai_response)
+        return ai_response
 
-        return Response({
-            'conversation_id': session.id,
-            'user_message': MessageSerializer(user_msg).data,
-            'ai_message': MessageSerializer(ai_msg).data,
-            'user_context': user_context
-        }, status=201)
\ No newline at end of file
+
+class ChatStreamAPIView(ChatAPIView):
+    """ChatAPIView.post as server-sent events, so the reply shows up while
+    the LLM is still generating it.
+
+    Events: start (conversation id, sent before the LLM call), token (prose
+    as it is generated), action (a JSON action was detected; its tokens are
+    not forwarded), results (the reply in parts, replacing any streamed
+    tokens, when it differs from them) and done (the same payload as
+    ChatAPIView, once both messages are saved).
+    """
+
+    def post(self, request):
+        user = request.user
+        text = request.data.get('text', '').strip()
+        conversation_id = request.data.get('conversation_id')
+
+        if not text:
+            return Response({'error': 'No message provided'}, status=400)
+
+        try:
+            session, user_context, payload, messages = self.start_turn(user, text, conversation_id)
+        except ConversationSession.DoesNotExist:
+            return Response({'error': 'Session not found.'}, status=404)
+
+        if payload:
+            events = iter([sse_event('start', {'conversation_id': session.id}), sse_event('done', payload)])
+        else:
+            events = self.stream_turn(session, text, user_context, messages, wants_llm_cache(request.data))
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def stream_turn(self, session, text, user_context, messages, use_cache):
+        yield sse_event('start', {'conversation_id': session.id})
+
+        reply = []
+        for kind, chunk in classify_stream(stream_llm(messages, user_context, use_cache=use_cache)):
+            reply.append(chunk)
+            if kind == TOKEN:
+                yield sse_event('token', {'text': chunk})
+            else:
+                has_json, command = parse_llm_response(chunk)
+                yield sse_event('action', {'action': command.get('action') if has_json else None})
+        ai_response = ''.join(reply)
+        print(f"LLM Response: {ai_response}")
+
+        resolved = self.resolve_response(text, user_context, ai_response)
+        if resolved != ai_response:
+            for part in result_chunks(resolved):
+                yield sse_event('results', {'text': part})
+
+        # The turn is saved once, after the whole reply is known
+        yield sse_event('done', self.save_turn(session, text, resolved, user_context))
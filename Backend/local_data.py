@@ -1,3 +1,10 @@
+import argparse
+import hashlib
+import io
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
 import pandas as pd
 import psycopg2
 
@@ -19,6 +26,104 @@ CSV_FILES = {
     "users": DATASET_PATH + "users.csv",
 }
 
+# Rows parsed, converted and written per batch. Peak memory is bounded by
+# the batch size rather than by the size of the largest CSV file.
+DEFAULT_CHUNK_SIZE = 50000
+
+# Column layout of each table, used by the COPY-based bulk loader.
+# "integers" lists columns that must be sent as whole numbers even when
+# pandas has widened them to float because of missing values.
+TABLE_SPECS = {
+    "distribution_centers": {
+        "key": "id",
+        "columns": ["id", "name", "latitude", "longitude"],
+        "integers": ["id"],
+    },
+    "products": {
+        "key": "id",
+        "columns": [
+            "id", "cost", "category", "name", "brand",
+            "retail_price", "department", "sku", "distribution_center_id",
+        ],
+        "integers": ["id", "distribution_center_id"],
+    },
+    "users": {
+        "key": "id",
+        "columns": [
+            "id", "first_name", "last_name", "email", "age", "gender", "state",
+            "street_address", "postal_code", "city", "country", "latitude",
+            "longitude", "traffic_source", "created_at",
+        ],
+        "integers": ["id", "age"],
+    },
+    "inventory_items": {
+        "key": "id",
+        "columns": [
+            "id", "product_id", "created_at", "sold_at", "cost",
+            "product_category", "product_name", "product_brand",
+            "product_retail_price", "product_department", "product_sku",
+            "product_distribution_center_id",
+        ],
+        "integers": ["id", "product_id", "product_distribution_center_id"],
+    },
+    "orders": {
+        "key": "order_id",
+        "columns": [
+            "order_id", "user_id", "status", "gender", "created_at",
+            "returned_at", "shipped_at", "delivered_at", "num_of_item",
+        ],
+        "integers": ["order_id", "user_id", "num_of_item"],
+    },
+    "order_items": {
+        "key": "id",
+        "columns": [
+            "id", "order_id", "user_id", "product_id", "inventory_item_id",
+            "status", "created_at", "shipped_at", "delivered_at", "returned_at",
+        ],
+        "integers": ["id", "order_id", "user_id", "product_id", "inventory_item_id"],
+    },
+}
+
+# Tables each table references. schema.sql declares no foreign keys, so by
+# default every table loads independently and all of them start at once;
+# --ordered (for schemas that do add the foreign keys) only starts a table
+# once every table it references has been committed.
+TABLE_REFERENCES = {
+    "distribution_centers": [],
+    "products": ["distribution_centers"],
+    "users": [],
+    "inventory_items": ["products", "distribution_centers"],
+    "orders": ["users"],
+    "order_items": ["orders", "inventory_items", "products", "users"],
+}
+NO_DEPENDENCIES = {table: [] for table in TABLE_REFERENCES}
+
+def table_dependencies(ordered=False):
+    return TABLE_REFERENCES if ordered else NO_DEPENDENCIES
+
+def dependency_order(tables, dependencies=TABLE_REFERENCES):
+    """Return the given tables in an order that satisfies dependencies"""
+    ordered = []
+    visiting = set()
+
+    def visit(table):
+        if table in ordered:
+            return
+        if table in visiting:
+            raise ValueError(f"Dependency cycle detected at table {table}")
+        visiting.add(table)
+        for dependency in dependencies[table]:
+            if dependency in tables:
+                visit(dependency)
+        visiting.discard(table)
+        ordered.append(table)
+
+    for table in tables:
+        visit(table)
+    return ordered
+
+LOAD_ORDER = dependency_order(list(TABLE_REFERENCES))
+
 def insert_distribution_centers(cur, df):
     for _, row in df.iterrows():
         cur.execute("""
@@ -27,8 +132,22 @@ def insert_distribution_centers(cur, df):
             ON CONFLICT (id) DO NOTHING
         """, (row['id'], row['name'], row['latitude'], row['longitude']))
 
+def partitioned_existing_ids(cur, table, df):
+    """Ids of a batch's rows already present in a partitioned table.
+
+    Its (id, created_at) key never conflicts for rows with a NULL
+    created_at, so the row-by-row inserts skip these ids themselves.
+    """
+    if not is_partitioned(cur, table):
+        return set()
+    cur.execute(f"SELECT id FROM {table} WHERE id = ANY(%s)", ([int(i) for i in df["id"].dropna()],))
+    return {row[0] for row in cur.fetchall()}
+
 def insert_inventory_items(cur, df):
+    existing = partitioned_existing_ids(cur, "inventory_items", df)
     for _, row in df.iterrows():
+        if row['id'] in existing:
+            continue
         # Convert NaN to None for timestamp columns
         created_at = row['created_at'] if pd.notnull(row['created_at']) else None
         sold_at = row['sold_at'] if pd.notnull(row['sold_at']) else None
@@ -39,7 +158,7 @@ def insert_inventory_items(cur, df):
                 product_retail_price, product_department, product_sku,
                 product_distribution_center_id
             ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (id) DO NOTHING
+            ON CONFLICT DO NOTHING
         """, (
             row['id'], row['product_id'], created_at, sold_at, row['cost'],
             row['product_category'], row['product_name'], row['product_brand'],
@@ -48,7 +167,10 @@ def insert_inventory_items(cur, df):
         ))
 
 def insert_order_items(cur, df):
+    existing = partitioned_existing_ids(cur, "order_items", df)
     for _, row in df.iterrows():
+        if row['id'] in existing:
+            continue
         created_at = row['created_at'] if pd.notnull(row['created_at']) else None
         shipped_at = row['shipped_at'] if pd.notnull(row['shipped_at']) else None
         delivered_at = row['delivered_at'] if pd.notnull(row['delivered_at']) else None
@@ -58,7 +180,7 @@ def insert_order_items(cur, df):
                 id, order_id, user_id, product_id, inventory_item_id,
                 status, created_at, shipped_at, delivered_at, returned_at
             ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (id) DO NOTHING
+            ON CONFLICT DO NOTHING
         """, (
             row['id'], row['order_id'], row['user_id'], row['product_id'], row['inventory_item_id'],
             row['status'], created_at, shipped_at, delivered_at, returned_at
@@ -109,50 +231,432 @@ def insert_users(cur, df):
             row['longitude'], row['traffic_source'], row['created_at']
         ))
 
-def main():
-    conn = psycopg2.connect(
+INSERT_FUNCTIONS = {
+    "distribution_centers": insert_distribution_centers,
+    "products": insert_products,
+    "users": insert_users,
+    "inventory_items": insert_inventory_items,
+    "orders": insert_orders,
+    "order_items": insert_order_items,
+}
+
+def dataframe_to_csv_buffer(df, spec):
+    """Render a DataFrame as CSV text for COPY, with NaN written as NULL"""
+    frame = df[spec["columns"]].copy()
+    for column in spec["integers"]:
+        # Missing values turn integer columns into floats ("12.0"), which
+        # Postgres rejects for INTEGER columns; the nullable Int64 dtype
+        # keeps whole numbers and writes missing values as empty fields.
+        frame[column] = frame[column].astype("Int64")
+    buffer = io.StringIO()
+    # Unquoted empty fields are read as NULL by COPY ... (FORMAT csv)
+    frame.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    return buffer
+
+def is_partitioned(cur, table):
+    """Whether the table was converted to monthly partitions (manage.py partition_tables)"""
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cur.fetchone()
+    return bool(row and row[0] == "p")
+
+def copy_table(cur, table, df, update_existing=False):
+    """Bulk load a DataFrame through a staging table and COPY FROM STDIN.
+
+    Rows are streamed into a temporary table and then merged with
+    INSERT ... ON CONFLICT DO NOTHING, so re-running the loader is still
+    safe against rows that are already present. With update_existing the
+    merge becomes an upsert, which incremental loads use for changed rows.
+
+    Partitioned tables can't have a unique key on id alone, and their
+    (id, created_at) key never matches rows with a NULL created_at, so
+    there staged rows are matched to existing ones on id before the insert.
+    """
+    spec = TABLE_SPECS[table]
+    key = spec["key"]
+    columns = ", ".join(spec["columns"])
+    staging = f"staging_{table}"
+    partitioned = is_partitioned(cur, table)
+    conflict_columns = [key, "created_at"] if partitioned else [key]
+
+    if update_existing:
+        assignments = ", ".join(
+            f"{column} = EXCLUDED.{column}"
+            for column in spec["columns"] if column not in conflict_columns
+        )
+        conflict_action = f"DO UPDATE SET {assignments}"
+    else:
+        conflict_action = "DO NOTHING"
+
+    cur.execute(f"""
+        CREATE TEMP TABLE IF NOT EXISTS {staging}
+        (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
+    """)
+    cur.copy_expert(
+        f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '')",
+        dataframe_to_csv_buffer(df, spec),
+    )
+    if partitioned and update_existing:
+        # Replace existing versions, which also moves a row whose
+        # created_at changed into its new partition
+        cur.execute(f"DELETE FROM {table} t USING {staging} s WHERE t.{key} = s.{key}")
+    elif partitioned:
+        cur.execute(f"DELETE FROM {staging} s USING {table} t WHERE s.{key} = t.{key}")
+    cur.execute(f"""
+        INSERT INTO {table} ({columns})
+        SELECT {columns} FROM {staging}
+        ON CONFLICT ({", ".join(conflict_columns)}) {conflict_action}
+    """)
+    cur.execute(f"TRUNCATE {staging}")
+
+def iter_csv_chunks(table, chunk_size=DEFAULT_CHUNK_SIZE, skip_rows=0):
+    """Yield a table's CSV file as DataFrames of at most chunk_size rows.
+
+    skip_rows drops that many data rows (after the header) without
+    materialising them, which is how interrupted loads resume.
+    """
+    skip = (lambda line: 0 < line <= skip_rows) if skip_rows else None
+    yield from pd.read_csv(CSV_FILES[table], chunksize=chunk_size, skiprows=skip)
+
+# --- Incremental loads -------------------------------------------------------
+#
+# Each table has a checkpoint row recording the checksum of the file it was
+# last loaded from and how many of its rows are committed, and every loaded
+# row has a hash of its values in loader_row_hashes. A row is shipped when
+# its hash is missing or differs, so edits to any column are picked up. The
+# checkpoint and the batch's hashes are committed in the same transaction as
+# the batch, so an interrupted load resumes right after the last committed
+# batch.
+
+def ensure_checkpoint_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS loader_checkpoints (
+            table_name VARCHAR(100) PRIMARY KEY,
+            file_checksum VARCHAR(64) NOT NULL,
+            rows_committed BIGINT NOT NULL DEFAULT 0,
+            completed BOOLEAN NOT NULL DEFAULT FALSE,
+            updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS loader_row_hashes (
+            table_name VARCHAR(100) NOT NULL,
+            row_key BIGINT NOT NULL,
+            row_hash BIGINT NOT NULL,
+            PRIMARY KEY (table_name, row_key)
+        )
+    """)
+
+def read_checkpoint(cur, table):
+    cur.execute("""
+        SELECT file_checksum, rows_committed, completed
+        FROM loader_checkpoints WHERE table_name = %s
+    """, (table,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return dict(zip(["file_checksum", "rows_committed", "completed"], row))
+
+def write_checkpoint(cur, table, checkpoint):
+    cur.execute("""
+        INSERT INTO loader_checkpoints (
+            table_name, file_checksum, rows_committed, completed, updated_at
+        ) VALUES (%s, %s, %s, %s, NOW())
+        ON CONFLICT (table_name) DO UPDATE SET
+            file_checksum = EXCLUDED.file_checksum,
+            rows_committed = EXCLUDED.rows_committed,
+            completed = EXCLUDED.completed,
+            updated_at = NOW()
+    """, (table, checkpoint["file_checksum"], checkpoint["rows_committed"], checkpoint["completed"]))
+
+def file_checksum(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as csv_file:
+        for block in iter(lambda: csv_file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def start_checkpoint(previous, checksum):
+    """Decide where an incremental load starts from.
+
+    Returns None when the file is unchanged since the last completed load.
+    An unfinished load of the same file resumes after its committed rows;
+    otherwise the file is read from the top.
+    """
+    if previous and previous["file_checksum"] == checksum:
+        if previous["completed"]:
+            return None
+        return dict(previous)
+    return {"file_checksum": checksum, "rows_committed": 0, "completed": False}
+
+def row_hashes(df, spec):
+    """A signed 64-bit hash of each row's values.
+
+    Values are hashed as text after the same integer normalisation COPY
+    uses, so a row hashes the same whichever batch it lands in.
+    """
+    frame = df[spec["columns"]].copy()
+    for column in spec["integers"]:
+        frame[column] = frame[column].astype("Int64")
+    return pd.util.hash_pandas_object(frame.astype(str), index=False).astype("int64")
+
+def read_row_hashes(cur, table, keys):
+    """Stored hashes of the given rows, by key"""
+    cur.execute(
+        "SELECT row_key, row_hash FROM loader_row_hashes WHERE table_name = %s AND row_key = ANY(%s)",
+        (table, keys),
+    )
+    return dict(cur.fetchall())
+
+def write_row_hashes(cur, table, keys, hashes):
+    """Record the hashes of shipped rows through a staging table and COPY"""
+    present = keys.notna()
+    buffer = io.StringIO()
+    pd.DataFrame({"row_key": keys[present], "row_hash": hashes[present]}).to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cur.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS staging_row_hashes
+        (row_key BIGINT, row_hash BIGINT) ON COMMIT DELETE ROWS
+    """)
+    cur.copy_expert("COPY staging_row_hashes (row_key, row_hash) FROM STDIN WITH (FORMAT csv)", buffer)
+    cur.execute("""
+        INSERT INTO loader_row_hashes (table_name, row_key, row_hash)
+        SELECT %s, row_key, row_hash FROM staging_row_hashes
+        ON CONFLICT (table_name, row_key) DO UPDATE SET row_hash = EXCLUDED.row_hash
+    """, (table,))
+    cur.execute("TRUNCATE staging_row_hashes")
+
+def select_new_or_changed(cur, table, df, spec):
+    """Filter a batch down to rows whose values differ from the last load.
+
+    Returns the rows and their hashes, which are stored once they are shipped.
+    """
+    keys = df[spec["key"]].astype("Int64")
+    hashes = row_hashes(df, spec)
+    stored = read_row_hashes(cur, table, [int(key) for key in keys.dropna()])
+    changed = [pd.isna(key) or stored.get(int(key)) != row_hash for key, row_hash in zip(keys, hashes)]
+    return df[changed], keys[changed], hashes[changed]
+
+def load_table_incremental(conn, table, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Ship only new or changed rows, committing a checkpoint with every batch"""
+    spec = TABLE_SPECS[table]
+    checksum = file_checksum(CSV_FILES[table])
+
+    with conn.cursor() as cur:
+        checkpoint = start_checkpoint(read_checkpoint(cur, table), checksum)
+        if checkpoint is None:
+            print(f"  {table}: unchanged since last load, skipping")
+            return 0
+
+        skip = checkpoint["rows_committed"]
+        if skip:
+            print(f"  {table}: resuming after {skip} committed rows")
+
+        shipped = 0
+        for chunk in iter_csv_chunks(table, chunk_size, skip_rows=skip):
+            batch, keys, hashes = select_new_or_changed(cur, table, chunk, spec)
+            if not batch.empty:
+                copy_table(cur, table, batch, update_existing=True)
+                write_row_hashes(cur, table, keys, hashes)
+                shipped += len(batch)
+            checkpoint["rows_committed"] += len(chunk)
+            write_checkpoint(cur, table, checkpoint)
+            conn.commit()
+
+        checkpoint["completed"] = True
+        write_checkpoint(cur, table, checkpoint)
+        conn.commit()
+
+    return shipped
+
+# Tables whose rows back the API's cached product searches
+SEARCH_CACHE_TABLES = {"products", "inventory_items"}
+
+def setup_django():
+    """Configure Django so the loader can reuse the API's own helpers"""
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        os.environ.setdefault("DJANGO_SETTINGS_MODULE", "chat_backend.settings")
+        django.setup()
+
+def invalidate_search_cache():
+    """Drop the API's cached product searches after the catalog changed.
+
+    Loads write through COPY and raw SQL, so the model signals that
+    normally invalidate the cache never fire.
+    """
+    try:
+        setup_django()
+        from conversations.caching import invalidate_search_cache as invalidate
+        invalidate()
+    except Exception as e:
+        print(f"  Could not invalidate the search cache ({e}); "
+              f"run `python manage.py search_cache --invalidate`")
+
+def refresh_trending_rollup():
+    """Rebuild the product_daily_sales rollup behind the trending endpoints.
+
+    Loaded rows can fall on any day, so every day is recomputed.
+    """
+    try:
+        setup_django()
+        from conversations.trending import refresh_daily_sales
+        refresh_daily_sales(full=True)
+    except Exception as e:
+        print(f"  Could not refresh the trending rollup ({e}); "
+              f"run `python manage.py refresh_trending_rollup --full`")
+
+def load_table(conn, table, mode="copy", chunk_size=DEFAULT_CHUNK_SIZE, incremental=False):
+    """Stream one CSV file into its table in fixed-size batches and report throughput"""
+    print(f"Inserting {table}...")
+    started = time.perf_counter()
+
+    if incremental:
+        rows = load_table_incremental(conn, table, chunk_size)
+    else:
+        rows = 0
+        with conn.cursor() as cur:
+            for chunk in iter_csv_chunks(table, chunk_size):
+                if mode == "copy":
+                    copy_table(cur, table, chunk)
+                else:
+                    INSERT_FUNCTIONS[table](cur, chunk)
+                rows += len(chunk)
+        conn.commit()
+
+    if rows and table in SEARCH_CACHE_TABLES:
+        invalidate_search_cache()
+    if rows and table == "order_items":
+        refresh_trending_rollup()
+
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed > 0 else float("inf")
+    print(f"  {table}: {rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+    return rows, elapsed
+
+def connect():
+    return psycopg2.connect(
         dbname=DB_NAME,
         user=DB_USER,
         password=DB_PASSWORD,
         host=DB_HOST,
         port=DB_PORT
     )
-    cur = conn.cursor()
-
-    # Insert data in order to satisfy foreign key dependencies
-    print("Inserting distribution_centers...")
-    df = pd.read_csv(CSV_FILES["distribution_centers"])
-    insert_distribution_centers(cur, df)
-    conn.commit()
-
-    print("Inserting products...")
-    df = pd.read_csv(CSV_FILES["products"])
-    insert_products(cur, df)
-    conn.commit()
-
-    print("Inserting users...")
-    df = pd.read_csv(CSV_FILES["users"])
-    insert_users(cur, df)
-    conn.commit()
-
-    print("Inserting inventory_items...")
-    df = pd.read_csv(CSV_FILES["inventory_items"])
-    insert_inventory_items(cur, df)
-    conn.commit()
-
-    print("Inserting orders...")
-    df = pd.read_csv(CSV_FILES["orders"])
-    insert_orders(cur, df)
-    conn.commit()
-
-    print("Inserting order_items...")
-    df = pd.read_csv(CSV_FILES["order_items"])
-    insert_order_items(cur, df)
-    conn.commit()
-
-    cur.close()
-    conn.close()
-    print("All data inserted successfully.")
+
+def load_table_worker(table, mode, chunk_size=DEFAULT_CHUNK_SIZE, incremental=False):
+    """Process pool entry point: load one table on a dedicated connection"""
+    conn = connect()
+    try:
+        return load_table(conn, table, mode, chunk_size, incremental)
+    finally:
+        conn.close()
+
+def load_tables_sequential(tables, mode, chunk_size=DEFAULT_CHUNK_SIZE, incremental=False,
+                           ordered=False):
+    conn = connect()
+    try:
+        return {
+            table: load_table(conn, table, mode, chunk_size, incremental)
+            for table in dependency_order(tables, table_dependencies(ordered))
+        }
+    finally:
+        conn.close()
+
+def load_tables_parallel(tables, mode, workers, chunk_size=DEFAULT_CHUNK_SIZE, incremental=False,
+                         ordered=False):
+    """Load tables concurrently, starting each one as soon as its dependencies finish.
+
+    Every worker process opens its own connection and commits its table in
+    its own transaction. Without ordered there are no dependencies, so every
+    table is submitted up front and the wall-clock time is bounded by the
+    largest table; with ordered, by the longest dependency chain.
+    """
+    dependencies = table_dependencies(ordered)
+    dependency_order(tables, dependencies)  # fail fast on cycles
+    pending = {
+        table: {dep for dep in dependencies[table] if dep in tables}
+        for table in tables
+    }
+    finished = set()
+    results = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while pending or running:
+            ready = [table for table, deps in pending.items() if deps <= finished]
+            for table in ready:
+                del pending[table]
+                running[pool.submit(load_table_worker, table, mode, chunk_size, incremental)] = table
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                table = running.pop(future)
+                results[table] = future.result()
+                finished.add(table)
+    return results
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load the e-commerce CSV dataset into Postgres")
+    parser.add_argument(
+        "--mode", choices=["copy", "insert"], default="copy",
+        help="copy: bulk COPY FROM STDIN (default); insert: row-by-row INSERT fallback",
+    )
+    parser.add_argument(
+        "--tables", nargs="+", choices=LOAD_ORDER, default=LOAD_ORDER,
+        help="Subset of tables to load",
+    )
+    parser.add_argument(
+        "--ordered", action="store_true",
+        help="Load referenced tables before the tables that reference them; "
+             "only needed when the schema declares foreign keys",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=min(len(LOAD_ORDER), os.cpu_count() or 1),
+        help="Number of tables loaded concurrently, each in its own process (1 = sequential)",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+        help="Rows read and written per batch; bounds peak memory per table",
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Only ship rows that are new or changed since the last load, "
+             "committing a resumable checkpoint after every batch",
+    )
+    args = parser.parse_args()
+    if args.incremental and args.mode != "copy":
+        parser.error("--incremental upserts changed rows and requires --mode copy")
+    return args
+
+def main():
+    args = parse_args()
+
+    if args.incremental:
+        # Created up front so concurrent workers don't race on CREATE TABLE
+        conn = connect()
+        with conn.cursor() as cur:
+            ensure_checkpoint_table(cur)
+        conn.commit()
+        conn.close()
+
+    started = time.perf_counter()
+    if args.workers > 1:
+        results = load_tables_parallel(
+            args.tables, args.mode, args.workers, args.chunk_size, args.incremental, args.ordered
+        )
+    else:
+        results = load_tables_sequential(
+            args.tables, args.mode, args.chunk_size, args.incremental, args.ordered
+        )
+
+    elapsed = time.perf_counter() - started
+    total_rows = sum(rows for rows, _ in results.values())
+    slowest = max(results, key=lambda table: results[table][1]) if results else None
+    print(f"All data inserted successfully ({total_rows} rows in {elapsed:.2f}s, "
+          f"mode={args.mode}, workers={args.workers}).")
+    if slowest:
+        print(f"Slowest table: {slowest} ({results[slowest][1]:.2f}s)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()